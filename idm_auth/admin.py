@@ -2,12 +2,52 @@ import copy
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserChangeForm as BaseUserChangeForm
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 from social_django.models import UserSocialAuth
 
 from . import models
 from django.utils.translation import ugettext_lazy as _
 
 
+class ApproximateCountPaginator(Paginator):
+    """
+    A paginator that, for unfiltered querysets over large tables, uses the planner's row estimate instead of COUNT(*)
+
+    Counting every row of a table with millions of them takes seconds, which the admin would otherwise do on every
+    changelist page. The estimate is refreshed by (auto)vacuum and analyze, which is good enough for page numbers.
+    If it's too high and a page past the real rows is asked for, the rows are counted after all and the last page
+    that has any is returned instead.
+    """
+    threshold = 100000
+    # Whether count is the estimate, and whether it's since been found to be too high
+    estimated = exact = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and not self.exact:
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > self.threshold:
+                self.estimated = True
+                return int(row[0])
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        if self.estimated and page.number > 1 and not page.object_list:
+            # Forget the estimate, and the page count worked out from it
+            self.estimated, self.exact = False, True
+            del self.count
+            self.__dict__.pop('num_pages', None)
+            page = super().page(self.num_pages)
+        return page
+
+
 class UserSocialAuthInline(admin.TabularInline):
     model = UserSocialAuth
     readonly_fields = fields = ('provider', 'uid')
@@ -29,9 +69,28 @@ class UserAdmin(BaseUserAdmin):
         UserSocialAuthInline,
     ]
     form = UserChangeForm
+    paginator = ApproximateCountPaginator
+    # Don't count the whole table again to show "n of N selected"
+    show_full_result_count = False
+    # Each is backed by a trigram index on UPPER(...), which serves Django's icontains (see migration 0012)
+    search_fields = ('username', 'first_name', 'last_name', 'email')
     fieldsets = BaseUserAdmin.fieldsets[:1] + (
         (_('Identity'), {'fields': ('identity_id', 'primary')}),
     ) + BaseUserAdmin.fieldsets[1:]
     #readonly_fields = BaseUserAdmin.readonly_fields + ('identity_id', 'primary')
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Searches as usual, but also matches users by any of their UserEmail addresses
+
+        That's done with a subquery rather than adding useremail__email to search_fields, which would join and need
+        a DISTINCT over the whole result.
+        """
+        for term in search_term.split():
+            condition = Q(pk__in=models.UserEmail.objects.filter(email__icontains=term).values('user_id'))
+            for field in self.search_fields:
+                condition |= Q(**{field + '__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset, False
+
 admin.site.register(models.User, UserAdmin)
\ No newline at end of file
@@ -23,7 +23,15 @@ class IDMAuthConfig(AppConfig):
             self.session.verify = os.environ['SSL_CERT_FILE']
 
         from social_django.models import UserSocialAuth
-        from . import models, serializers
+        from . import metrics, models, serializers, session_backend
+        from .backend_meta import BackendMeta
+
+        BackendMeta.social_backends()
+
+        if session_backend.enabled():
+            metrics.gauge('sessions.active', lambda: session_backend.get_session_counts()['active'])
+            metrics.gauge('sessions.authenticated', lambda: session_backend.get_session_counts()['authenticated'])
+            post_save.connect(session_backend.user_saved, models.User)
 
         apps.get_app_config('idm_broker').register_notifications([
             {'serializer': serializers.UserSerializer, 'exchange': 'user'},
@@ -32,7 +40,36 @@ class IDMAuthConfig(AppConfig):
         post_delete.connect(self.user_social_auth_updated, UserSocialAuth)
         post_save.connect(self.user_social_auth_updated, UserSocialAuth)
 
+        from oidc_provider.models import RSAKey, Token
+        from .auth_core_integration.models import IdentityProjection
+        from .oidc import access_tokens, keys
+
+        keys.install()
+        post_save.connect(keys.invalidate, RSAKey)
+        post_delete.connect(keys.invalidate, RSAKey)
+
+        post_delete.connect(self.oidc_token_deleted, Token)
+        post_delete.connect(access_tokens.token_deleted, Token)
+        post_save.connect(self.user_updated, models.User)
+        post_save.connect(self.identity_projection_updated, IdentityProjection)
+        post_delete.connect(self.identity_projection_updated, IdentityProjection)
+
     def user_social_auth_updated(self, instance, **kwargs):
+        from . import social_credentials
+        social_credentials.invalidate(instance.provider, instance.user_id)
         if not getattr(instance, '_sync_social_auth_pending', False):
             instance._sync_social_auth_pending = True
-            connection.on_commit(lambda: sync_social_accounts.delay(instance.user.pk))
\ No newline at end of file
+            connection.on_commit(lambda: sync_social_accounts.delay(instance.user.pk))
+
+    def oidc_token_deleted(self, instance, **kwargs):
+        from .oidc import cache
+        cache.invalidate_token(instance.access_token)
+
+    def user_updated(self, instance, **kwargs):
+        from .oidc import cache
+        cache.invalidate_users([instance.pk])
+
+    def identity_projection_updated(self, instance, **kwargs):
+        from .oidc import cache
+        from .models import User
+        cache.invalidate_users(User.objects.filter(identity_id=instance.identity_id).values_list('pk', flat=True))
@@ -0,0 +1,184 @@
+"""
+An ASGI application that serves the proxied APIs asynchronously
+
+Proxied calls spend nearly all their time waiting on the upstream API, which ties up a WSGI worker for the duration.
+Here they're relayed with aiohttp on an event loop instead, so a single process can have many slow upstream calls in
+flight. The only blocking work, checking the access token and looking up the user's upstream credentials, is done in
+the default executor.
+
+Django 1.11 can't serve views under ASGI, so this only handles the paths under /proxied-api/; everything else should
+still be routed to the WSGI application. Run it with any ASGI 3 server, e.g.::
+
+    uvicorn idm_auth.asgi:application
+
+Django is set up when the server starts the application (or on its first request), not when this module is imported.
+This needs Python 3.5 or later.
+"""
+
+import asyncio
+import os
+import time
+from urllib.parse import parse_qs, urljoin
+
+import aiohttp
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'idm_auth.settings')
+
+
+class AsyncProxiedAPI(object):
+    """The asynchronous counterpart of ProxiedAPIView, filtering headers and authenticating the same way"""
+
+    def __init__(self, api_url, provider, client_id):
+        self.api_url, self.provider, self.client_id = api_url, provider, client_id
+        self._session = None
+
+    @property
+    def session(self):
+        # Created on first use, so that it belongs to the server's event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=getattr(settings, 'PROXIED_API_ASYNC_CONNECTIONS', 100))
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_credentials(self, access_token, site_url):
+        """Checks the access token and returns the user's upstream credentials; this blocks, so runs in a thread"""
+        from oidc_provider.lib.utils.common import get_issuer
+        from idm_auth import social_credentials
+        from idm_auth.oidc import access_tokens
+
+        close_old_connections()
+        try:
+            token = access_tokens.get_token(access_token, get_issuer(site_url=site_url))
+            timeout = max(int((token.expires_at - timezone.now()).total_seconds()), 1)
+            return social_credentials.get_credentials(self.provider, token.user_id, timeout)
+        finally:
+            close_old_connections()
+
+    async def __call__(self, scope, receive, send, path_info):
+        from social_django.models import UserSocialAuth
+        from idm_auth import metrics
+        from idm_auth.oidc import access_tokens
+        from idm_auth.views.proxied_api import ProxiedAPIView
+
+        start = time.time()
+        headers, access_token, host = {}, '', None
+        for k, v in scope['headers']:
+            k, v = k.decode('latin-1').lower(), v.decode('latin-1')
+            if k == 'authorization' and v.startswith('Bearer '):
+                access_token = v.split(None, 1)[1]
+            # Host isn't passed upstream, but is needed for our issuer
+            if k == 'host':
+                host = v
+            if k not in ProxiedAPIView.discard_request_headers:
+                headers[k] = v
+        query_string = scope['query_string'].decode('latin-1')
+        access_token = access_token or parse_qs(query_string).get('access_token', [''])[0]
+        site_url = '{}://{}'.format(scope.get('scheme', 'http'), host or get_server_host(scope))
+
+        try:
+            credentials = await asyncio.get_event_loop().run_in_executor(None, self.get_credentials, access_token,
+                                                                         site_url)
+        except access_tokens.InvalidAccessToken:
+            await send_empty_response(send, 401, [(b'www-authenticate', b'error="invalid_token"')])
+            return
+        except UserSocialAuth.DoesNotExist:
+            await send_empty_response(send, 403)
+            return
+        headers['authorization'] = '{} {}'.format(credentials.get('token_type') or 'Bearer',
+                                                  credentials['access_token'])
+
+        has_body = 'content-length' in headers or 'transfer-encoding' in headers
+        async with self.session.request(scope['method'], urljoin(self.api_url, path_info) + '?' + query_string,
+                                        headers=headers, data=RequestBody(receive) if has_body else None,
+                                        allow_redirects=False) as upstream_response:
+            metrics.timing('proxied_api.time_to_first_byte', time.time() - start)
+            await send({
+                'type': 'http.response.start',
+                'status': upstream_response.status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                            for k, v in upstream_response.headers.items()
+                            if k.lower() not in ProxiedAPIView.discard_response_headers],
+            })
+            async for chunk in upstream_response.content.iter_chunked(ProxiedAPIView.chunk_size):
+                metrics.incr('proxied_api.bytes', len(chunk))
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        metrics.timing('proxied_api.duration', time.time() - start)
+
+
+class RequestBody(object):
+    """An asynchronous iterator over the chunks of an ASGI request body, for aiohttp to stream upstream"""
+
+    def __init__(self, receive):
+        self.receive = receive
+        self.more_body = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.more_body:
+            raise StopAsyncIteration
+        message = await self.receive()
+        if message['type'] != 'http.request':
+            raise StopAsyncIteration
+        self.more_body = message.get('more_body', False)
+        return message.get('body', b'')
+
+
+def get_server_host(scope):
+    """The host and port the request was received on, for a request without a Host header"""
+    if not scope.get('server'):
+        return 'localhost'
+    host, port = scope['server']
+    if port in (None, {'http': 80, 'https': 443}.get(scope.get('scheme', 'http'))):
+        return host
+    return '{}:{}'.format(host, port)
+
+
+async def send_empty_response(send, status, headers=()):
+    await send({'type': 'http.response.start', 'status': status, 'headers': list(headers)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# Mirrors the proxied-api patterns in idm_auth.urls; populated by setup()
+proxied_apis = {}
+
+
+def setup():
+    if not apps.ready:
+        django.setup()
+    if not proxied_apis and getattr(settings, 'SOCIAL_AUTH_ORCID_KEY', None):
+        proxied_apis['/proxied-api/orcid/'] = AsyncProxiedAPI(api_url='https://api.sandbox.orcid.org/',
+                                                              provider='orcid',
+                                                              client_id=settings.SOCIAL_AUTH_ORCID_KEY)
+
+
+async def application(scope, receive, send):
+    setup()
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for proxied_api in proxied_apis.values():
+                    await proxied_api.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    elif scope['type'] == 'http':
+        for prefix, proxied_api in proxied_apis.items():
+            if scope['path'].startswith(prefix):
+                await proxied_api(scope, receive, send, scope['path'][len(prefix):])
+                return
+        await send_empty_response(send, 404)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentityProjection',
+            fields=[
+                ('identity_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('identity_type', models.CharField(blank=True, max_length=32)),
+                ('state', models.CharField(blank=True, max_length=32)),
+                ('has_primary_name', models.BooleanField(default=False)),
+                ('name_plain', models.TextField(blank=True)),
+                ('name_given', models.TextField(blank=True)),
+                ('name_family', models.TextField(blank=True)),
+                ('name_first', models.TextField(blank=True)),
+                ('name_last', models.TextField(blank=True)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('email_validated', models.BooleanField(default=False)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import models
+
+
+class IdentityProjection(models.Model):
+    """
+    A local copy of the parts of an idm-core identity that go into OpenID Connect claims
+
+    This is kept up to date from idm.core.person messages by process_person_update, so that building claims doesn't
+    need to call idm-core.
+    """
+    identity_id = models.UUIDField(primary_key=True)
+    identity_type = models.CharField(max_length=32, blank=True)
+    state = models.CharField(max_length=32, blank=True)
+
+    has_primary_name = models.BooleanField(default=False)
+    name_plain = models.TextField(blank=True)
+    name_given = models.TextField(blank=True)
+    name_family = models.TextField(blank=True)
+    name_first = models.TextField(blank=True)
+    name_last = models.TextField(blank=True)
+
+    # The validated email address we'd give out, or failing that, the first one
+    email = models.EmailField(max_length=254, blank=True)
+    email_validated = models.BooleanField(default=False)
+
+    modified = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def update_from_identity(cls, identity_id, identity):
+        primary_name = identity.get('primary_name') or {}
+        emails = identity.get('emails') or []
+        emails = [e for e in emails if e.get('validated')] or emails
+        projection, _ = cls.objects.update_or_create(identity_id=identity_id, defaults={
+            'identity_type': identity.get('@type', ''),
+            'state': identity.get('state', ''),
+            'has_primary_name': bool(primary_name),
+            'name_plain': primary_name.get('plain', ''),
+            'name_given': primary_name.get('given', ''),
+            'name_family': primary_name.get('family', ''),
+            'name_first': primary_name.get('first', ''),
+            'name_last': primary_name.get('last', ''),
+            'email': emails[0]['value'] if emails else '',
+            'email_validated': bool(emails and emails[0].get('validated')),
+        })
+        return projection
+
+    @classmethod
+    def get_or_fetch(cls, identity_id):
+        """Returns the projection for an identity, fetching it from idm-core if we've not seen it yet"""
+        try:
+            return cls.objects.get(identity_id=identity_id)
+        except cls.DoesNotExist:
+            from .utils import get_identity_data
+            return cls.update_from_identity(identity_id, get_identity_data(identity_id))
@@ -12,6 +12,7 @@ logger = get_task_logger(__name__)
 @celery.shared_task(ignore_result=True)
 def process_person_update(body, delivery_info, **kwargs):
     from idm_auth import models
+    from idm_auth.auth_core_integration.models import IdentityProjection
     from idm_auth.onboarding.models import PendingActivation
 
     with transaction.atomic(savepoint=False):
@@ -22,6 +23,7 @@ def process_person_update(body, delivery_info, **kwargs):
             logger.exception("Bad identity_id in routing key %s", delivery_info['routing_key'])
             raise
         if action in ('created', 'changed'):
+            IdentityProjection.update_from_identity(identity_id, body)
             users = models.User.objects.filter(identity_id=identity_id)
             if not users.exists() and body['@type'] == 'Person' and body['state'] == 'established':
                 PendingActivation.objects.get_or_create(identity_id=identity_id)
@@ -32,6 +34,7 @@ def process_person_update(body, delivery_info, **kwargs):
                 user.save()
             logger.info("Identity changed")
         elif action == 'deleted':
+            IdentityProjection.objects.filter(identity_id=identity_id).delete()
             for user in models.User.objects.filter(identity_id=identity_id):
                 user.delete()
             logger.info("Identity deleted")
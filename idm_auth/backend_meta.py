@@ -1,14 +1,36 @@
-from django.urls import reverse
-from social_django.utils import load_backend, load_strategy
-
-
 class BackendMeta(object):
     registry = {}
+    _social_backends = None
+
+    @classmethod
+    def register(cls, backend_meta):
+        BackendMeta.registry[backend_meta.backend_id] = backend_meta()
+        BackendMeta._social_backends = None
+
+    @classmethod
+    def social_backends(cls):
+        """
+        Returns the non-SAML backends, ordered by name, for offering as login options.
+
+        This is computed once (by IDMAuthConfig.ready()), and again only if another backend is registered.
+        """
+        if BackendMeta._social_backends is None:
+            BackendMeta._social_backends = tuple(sorted((bm for bm in BackendMeta.registry.values()
+                                                         if bm.backend_id != 'saml'),
+                                                        key=lambda bm: bm.name))
+        return BackendMeta._social_backends
 
     @classmethod
     def wrap(cls, user_social_auth):
         return type(cls.registry.get(user_social_auth.provider))(user_social_auth)
 
+    @classmethod
+    def wrap_all(cls, user_social_auths):
+        """Wraps several UserSocialAuth instances, looking up any SAML IdP labels in one go"""
+        wrapped = [cls.wrap(user_social_auth) for user_social_auth in user_social_auths]
+        SAMLBackendMeta.resolve_labels([bm for bm in wrapped if isinstance(bm, SAMLBackendMeta)])
+        return wrapped
+
     def __init__(self, user_social_auth=None):
         self.user_social_auth = user_social_auth
 
@@ -85,24 +107,35 @@ class GithubBackendMeta(BackendMeta):
 
 class SAMLBackendMeta(BackendMeta):
     backend_id = 'saml'
-    name = 'SAML'
     font_icon = 'fa fa-university'
+    _label = None
 
     @property
-    def name(self):
-        saml_backend = load_backend(
-            load_strategy(),
-            "saml",
-            redirect_uri=reverse('social:complete', args=("saml",))
-        )
-        return saml_backend.get_idp(self.user_social_auth.uid.split(':')[0]).conf['label']
+    def idp_name(self):
+        return self.user_social_auth.uid.split(':')[0]
 
+    @property
+    def name(self):
+        if not self.user_social_auth:
+            return 'SAML'
+        if self._label is None:
+            self.resolve_labels([self])
+        return self._label
 
     @property
     def username(self):
         return '{} at {}'.format(self.user_social_auth.uid.split(':')[1], self.name)
 
+    @classmethod
+    def resolve_labels(cls, backend_metas):
+        from idm_auth.saml.models import IDP
+        unresolved = [bm for bm in backend_metas if bm._label is None]
+        if unresolved:
+            labels = dict(IDP.objects.filter(name__in={bm.idp_name for bm in unresolved}).values_list('name', 'label'))
+            for bm in unresolved:
+                bm._label = labels.get(bm.idp_name, bm.idp_name)
+
 
 for backend_meta in (TwitterBackendMeta, GoogleOAuth2BackendMeta, ORCIDBackendMeta, FacebookBackendMeta,
                      FigshareBackendMeta, LinkedinBackendMeta, GithubBackendMeta, SAMLBackendMeta):
-    BackendMeta.registry[backend_meta.backend_id] = backend_meta()
+    BackendMeta.register(backend_meta)
@@ -0,0 +1,32 @@
+"""Helpers shared by the benchmark_* management commands"""
+
+import time
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return None
+    index = min(int(round(fraction * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """Summarizes a list of durations (in seconds) as milliseconds"""
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': 1000 * sum(samples) / len(samples),
+        'p50_ms': 1000 * percentile(samples, 0.5),
+        'p95_ms': 1000 * percentile(samples, 0.95),
+        'p99_ms': 1000 * percentile(samples, 0.99),
+        'max_ms': 1000 * samples[-1],
+    }
+
+
+def time_call(func, *args, **kwargs):
+    """Returns the duration of a call, and its result"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
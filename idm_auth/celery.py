@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_process_init
 from django.apps import apps
 
 app = Celery(__package__)
@@ -8,4 +9,11 @@ app = Celery(__package__)
 # Using a string here means the worker will not have to
 # pickle the object when using Windows.
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks(lambda: [n.name for n in apps.get_app_configs()])
\ No newline at end of file
+app.autodiscover_tasks(lambda: [n.name for n in apps.get_app_configs()])
+
+
+@worker_process_init.connect
+def start_credential_manager(**kwargs):
+    # Each forked worker needs its own, as the parent's renewal thread doesn't survive the fork
+    from idm_auth.kerberos.credentials import start_credential_manager
+    start_credential_manager()
@@ -1,6 +1,6 @@
 from django.conf import settings
 
-from two_factor.utils import default_device
+from .otp import default_device
 
 
 class TwoFactorEnabled(object):
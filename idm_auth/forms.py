@@ -1,7 +1,7 @@
 import uuid
 
 from django import forms
-from django.contrib.auth import forms as auth_forms, get_user_model
+from django.contrib.auth import authenticate, forms as auth_forms, get_user_model, password_validation
 from django.utils.translation import ugettext_lazy as _
 import zxcvbn_password.fields
 
@@ -24,31 +24,36 @@ class AuthenticationForm(auth_forms.AuthenticationForm):
                                    'in the email you received, and then try again.')
 
     def clean(self):
-        username = self.cleaned_data.get('username')
-        try:
-            str(uuid.UUID(username or ''))
-        except ValueError:
-            try:
-                user = models.User.objects.get(username=username)
-            except models.User.DoesNotExist:
-                try:
-                    user = models.User.objects.get(useremail__email=username)
-                except models.User.DoesNotExist:
-                    username = str(uuid.uuid4())
-                else:
-                    username = str(user.pk)
+        identifier = self.cleaned_data.get('username')
+        password = self.cleaned_data.get('password')
+
+        if identifier is not None and password:
+            user = models.resolve_login_user(identifier)
+            # Unknown users get a random ID, so that the backends still spend time running a hasher
+            username = str(user.pk) if user else str(uuid.uuid4())
+            self.cleaned_data['username'] = username
+            # Passing the user along saves the backend from fetching it again
+            self.user_cache = authenticate(self.request, username=username, password=password, user=user)
+            if self.user_cache is None:
+                raise forms.ValidationError(
+                    self.error_messages['invalid_login'],
+                    code='invalid_login',
+                    params={'username': self.username_field.verbose_name},
+                )
             else:
-                try:
-                    models.User.objects.get(useremail__email=username)
-                except models.User.DoesNotExist:
-                    pass
-                username = str(user.pk)
-        self.cleaned_data['username'] = username
-        return super().clean()
+                self.confirm_login_allowed(self.user_cache)
+
+        return self.cleaned_data
+
+
+class PasswordField(zxcvbn_password.fields.PasswordField):
+    # SetPasswordForm.clean_new_password1 runs the password validators with the user, where there is one, so don't
+    # also run them all here without
+    default_validators = []
 
 
 class SetPasswordForm(auth_forms.SetPasswordForm):
-    new_password1 = zxcvbn_password.fields.PasswordField(label=_("New password"))
+    new_password1 = PasswordField(label=_("New password"))
     new_password2 = zxcvbn_password.fields.PasswordConfirmationField(label=_("New password confirmation"),
                                                                      confirm_with='password1')
 
@@ -56,6 +61,19 @@ class SetPasswordForm(auth_forms.SetPasswordForm):
     def __init__(self, user=None, *args, **kwargs):
         super().__init__(user, *args, **kwargs)
 
+    def clean_new_password1(self):
+        password = self.cleaned_data.get('new_password1')
+        password_validation.validate_password(password, self.user)
+        return password
+
+    def clean_new_password2(self):
+        # Unlike Django's, this only checks the passwords match; they've already been validated as new_password1
+        password1 = self.cleaned_data.get('new_password1')
+        password2 = self.cleaned_data.get('new_password2')
+        if password1 and password2 and password1 != password2:
+            raise forms.ValidationError(self.error_messages['password_mismatch'], code='password_mismatch')
+        return password2
+
 
 class PasswordChangeForm(SetPasswordForm, auth_forms.PasswordChangeForm):
     pass
\ No newline at end of file
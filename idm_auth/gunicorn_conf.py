@@ -0,0 +1,12 @@
+"""
+gunicorn settings for serving idm-auth, e.g.::
+
+    gunicorn -c python:idm_auth.gunicorn_conf idm_auth.wsgi
+
+Each worker gets the client principal's TGT as soon as it's forked, rather than while handling its first request.
+"""
+
+
+def post_fork(server, worker):
+    from idm_auth.kerberos.credentials import start_credential_manager
+    start_credential_manager()
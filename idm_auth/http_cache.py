@@ -0,0 +1,102 @@
+"""
+A size-bounded, in-process cache of upstream HTTP responses, used by ProxiedAPIView
+
+Responses are kept according to the upstream Cache-Control header, and when they go stale are revalidated using their
+ETag or Last-Modified validators. Once the cached bodies exceed the cache's size, the least recently used are evicted.
+"""
+
+import collections
+import threading
+import time
+
+from requests.structures import CaseInsensitiveDict
+
+CachedResponse = collections.namedtuple('CachedResponse', ('status', 'headers', 'body', 'expires_at'))
+
+
+def parse_cache_control(value):
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers):
+    """
+    Returns how many seconds a response may be reused for without revalidation, or None if it mustn't be stored
+
+    Responses without a max-age can still be stored if they have a validator, but need revalidating on every use.
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives:
+        return None
+    has_validator = 'ETag' in headers or 'Last-Modified' in headers
+    if 'no-cache' in directives:
+        return 0 if has_validator else None
+    try:
+        return max(int(directives['max-age']), 0)
+    except (KeyError, TypeError, ValueError):
+        return 0 if has_validator else None
+
+
+def vary_headers(headers):
+    """Returns the lower-cased names of the request headers a response varies on, or None if it varies on anything"""
+    names = {name.strip().lower() for name in headers.get('Vary', '').split(',') if name.strip()}
+    return None if '*' in names else names
+
+
+def conditional_headers(cached):
+    headers = {}
+    if 'ETag' in cached.headers:
+        headers['If-None-Match'] = cached.headers['ETag']
+    if 'Last-Modified' in cached.headers:
+        headers['If-Modified-Since'] = cached.headers['Last-Modified']
+    return headers
+
+
+class ResponseCache(object):
+    def __init__(self, max_size, max_entry_size):
+        self.max_size, self.max_entry_size = max_size, max_entry_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            except KeyError:
+                return None
+
+    def set(self, key, status, headers, body, lifetime):
+        if len(body) > self.max_entry_size:
+            return
+        entry = CachedResponse(status, CaseInsensitiveDict(headers), body, time.time() + lifetime)
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def freshen(self, key, lifetime, headers=()):
+        """
+        Marks an entry as fresh again, after upstream has confirmed that it hasn't changed
+
+        `headers` are those sent with the 304, which replace the stored ones of the same name.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                updated_headers = CaseInsensitiveDict(entry.headers)
+                updated_headers.update(headers)
+                self.entries[key] = entry._replace(headers=updated_headers, expires_at=time.time() + lifetime)
+                return self.entries[key]
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.body)
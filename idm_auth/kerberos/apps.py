@@ -1,10 +1,6 @@
-import logging
-
 from django.apps import AppConfig
-from django.conf import settings
-import kadmin
 
-logger = logging.getLogger(__name__)
+from .kdc import get_kdc
 
 
 class KerberosConfig(AppConfig):
@@ -12,7 +8,4 @@ class KerberosConfig(AppConfig):
 
 
 def get_kadmin():
-    try:
-        return kadmin.init_with_keytab(settings.KADMIN_PRINCIPAL_NAME)
-    except kadmin.CCNotFoundError:
-        logger.exception("Couldn't get kadmin")
+    return get_kdc().get_kadmin()
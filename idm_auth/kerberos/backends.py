@@ -2,4 +2,9 @@ from django.contrib.auth.backends import ModelBackend
 
 
 class KerberosBackend(ModelBackend):
-    pass
\ No newline at end of file
+    def authenticate(self, request, username=None, password=None, user=None, **kwargs):
+        # idm_auth.forms.AuthenticationForm has usually already looked the user up
+        if user is None:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
@@ -0,0 +1,136 @@
+import atexit
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from idm_auth import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialManager(threading.Thread):
+    """
+    Keeps a TGT for the client principal in a private credentials cache
+
+    The initial TGT is acquired from the keytab synchronously by start(), and a background thread replaces it
+    `renew_margin` seconds before it expires, or retries every `retry_interval` seconds while it can't get one.
+    KRB5CCNAME is pointed at the cache once it has a TGT, so GSSAPI (e.g. HTTPNegotiateAuth), pykerberos and kadmin
+    pick it up without ever having to acquire credentials while handling a request.
+
+    Threads don't survive a fork, so start_credential_manager() should be called in each worker process after it's
+    forked; see idm_auth.gunicorn_conf and idm_auth.celery.
+    """
+    retry_interval = 30
+
+    def __init__(self, principal, keytab, lifetime=36000, renew_margin=3600):
+        super().__init__(name='kerberos-credential-manager', daemon=True)
+        self.principal = principal
+        self.keytab = keytab
+        self.lifetime = lifetime
+        self.renew_margin = min(renew_margin, lifetime // 2)
+        self.ccache_dir = tempfile.mkdtemp(prefix='idm-auth-krb5cc-')
+        self.ccache_path = os.path.join(self.ccache_dir, 'ccache')
+        self.pid = os.getpid()
+        self.acquired_at = None
+        self.next_attempt = None
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+
+    @property
+    def ccache_name(self):
+        return 'FILE:' + self.ccache_path
+
+    @property
+    def ticket_age(self):
+        if self.acquired_at is not None:
+            return time.time() - self.acquired_at
+
+    def acquire(self):
+        # Write to a new cache and move it into place, so that nothing reads a half-written cache
+        new_ccache_path = self.ccache_path + '.new'
+        subprocess.check_call(['kinit', '-k', '-t', self.keytab, '-c', 'FILE:' + new_ccache_path,
+                               '-l', '{}s'.format(self.lifetime), self.principal])
+        os.rename(new_ccache_path, self.ccache_path)
+        os.environ['KRB5CCNAME'] = self.ccache_name
+        self.acquired_at = time.time()
+        self.next_attempt = self.acquired_at + self.lifetime - self.renew_margin
+        self.ready.set()
+        metrics.incr('kerberos.tgt.acquired')
+        logger.info("Acquired TGT for %s", self.principal)
+
+    def try_acquire(self):
+        try:
+            self.acquire()
+        except (OSError, subprocess.CalledProcessError):
+            self.next_attempt = time.time() + self.retry_interval
+            metrics.incr('kerberos.tgt.failed')
+            logger.exception("Couldn't acquire TGT for %s; retrying in %ds", self.principal, self.retry_interval)
+
+    def start(self):
+        self.try_acquire()
+        metrics.gauge('kerberos.tgt.age', lambda: self.ticket_age)
+        super().start()
+
+    def run(self):
+        while not self.stopping.wait(max(self.next_attempt - time.time(), 0)):
+            self.try_acquire()
+
+    def stop(self):
+        self.stopping.set()
+        # A forked child inherits the atexit handler, but the cache belongs to the process that created it
+        if os.getpid() == self.pid:
+            shutil.rmtree(self.ccache_dir, ignore_errors=True)
+
+
+_lock = threading.Lock()
+_manager = None
+
+
+def start_credential_manager():
+    """
+    Starts a CredentialManager for this process if one is configured and it doesn't have one, and returns it
+
+    This runs kinit, so is called from worker start-up hooks rather than from AppConfig.ready(), which would also run
+    it for management commands and in a pre-fork parent whose thread the workers wouldn't inherit. A failure to get
+    the initial TGT is logged, and retried in the background.
+    """
+    global _manager
+    if not (getattr(settings, 'CLIENT_PRINCIPAL_NAME', None) and getattr(settings, 'KERBEROS_CLIENT_KEYTAB', None)):
+        return None
+    with _lock:
+        if _manager is None or _manager.pid != os.getpid():
+            manager = CredentialManager(settings.CLIENT_PRINCIPAL_NAME, settings.KERBEROS_CLIENT_KEYTAB,
+                                        lifetime=settings.KERBEROS_TGT_LIFETIME,
+                                        renew_margin=settings.KERBEROS_TGT_RENEW_MARGIN)
+            manager.start()
+            atexit.register(manager.stop)
+            _manager = manager
+        return _manager
+
+
+def get_credential_manager():
+    """Returns this process's running CredentialManager, or None if it hasn't started one"""
+    if _manager is not None and _manager.pid == os.getpid():
+        return _manager
+
+
+def get_ccache_name(timeout=5):
+    """
+    Returns the name of the managed credentials cache, once it has a TGT, or None if there isn't a manager
+
+    This never acquires a TGT itself; if the manager hasn't managed to yet, it waits up to `timeout` seconds for it.
+    """
+    manager = get_credential_manager()
+    if manager is None:
+        return None
+    if not manager.ready.wait(timeout):
+        metrics.incr('kerberos.tgt.missing')
+        logger.warning("No TGT for %s yet", manager.principal)
+        return None
+    return manager.ccache_name
@@ -1,11 +1,10 @@
-import kerberos
 from collections import OrderedDict
-from django.conf import settings
 
 from django.contrib.auth.hashers import BasePasswordHasher
 from django.utils.translation import ugettext_noop as _
 
 from idm_auth.kerberos.apps import get_kadmin
+from idm_auth.kerberos.kdc import get_kdc
 
 
 class KerberosHasher(BasePasswordHasher):
@@ -13,7 +12,7 @@ class KerberosHasher(BasePasswordHasher):
     A Django password hasher implementation backed by a Kerberos KDC
 
     Instead of hashing and storing the password on the user model, this hasher stores a reference to the password in the
-    KDC and uses kerberos.checkPassword to validate it.
+    KDC and asks the configured KDC backend (see idm_auth.kerberos.kdc) to validate it.
 
     For users without a username, it defaults to using the default password hasher, which we expect *will* store the
     password locally.
@@ -42,12 +41,7 @@ class KerberosHasher(BasePasswordHasher):
 
     def verify(self, password, encoded):
         algorithm, kvno, principal = encoded.split('$', 2)
-        try:
-            return kerberos.checkPassword(principal, password,
-                                          settings.CLIENT_PRINCIPAL_NAME,
-                                           settings.DEFAULT_REALM)
-        except kerberos.BasicAuthError as e:
-            return False
+        return get_kdc().check_password(principal, password)
 
     def safe_summary(self, encoded):
         algorithm, kvno, principal = encoded.split('$', 2)
@@ -0,0 +1,187 @@
+"""
+Pluggable access to the Kerberos KDC
+
+Everything that needs to administer principals or check passwords goes through the KDC backend configured in the
+KERBEROS_KDC setting, so that the hasher and user model can be exercised without a real KDC.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from . import KerberosAttribute, credentials
+
+logger = logging.getLogger(__name__)
+
+
+class BaseKDC(object):
+    def __init__(self, **options):
+        self.options = options
+
+    def get_kadmin(self):
+        """Returns a kadmin handle, or None if one couldn't be acquired"""
+        raise NotImplementedError
+
+    def check_password(self, principal, password):
+        """Returns whether the password is correct for the principal"""
+        raise NotImplementedError
+
+
+class KadminKDC(BaseKDC):
+    """
+    Talks to a real KDC using python-kadmin and pykerberos
+
+    Both use the TGT kept by this process's CredentialManager, if it has one (see idm_auth.kerberos.credentials).
+    kadmin only does so when KADMIN_PRINCIPAL_NAME is the client principal; otherwise it uses its own keytab entry.
+    """
+
+    def get_kadmin(self):
+        import kadmin
+        ccache_name = credentials.get_ccache_name()
+        try:
+            if ccache_name and settings.KADMIN_PRINCIPAL_NAME in (None, settings.CLIENT_PRINCIPAL_NAME):
+                return kadmin.init_with_ccache(settings.CLIENT_PRINCIPAL_NAME, ccache_name)
+            return kadmin.init_with_keytab(settings.KADMIN_PRINCIPAL_NAME)
+        except kadmin.CCNotFoundError:
+            logger.exception("Couldn't get kadmin")
+
+    def check_password(self, principal, password):
+        import kerberos
+        # Waits for the managed TGT, if there's a manager still getting one, rather than checking without it
+        credentials.get_ccache_name()
+        try:
+            return kerberos.checkPassword(principal, password,
+                                          settings.CLIENT_PRINCIPAL_NAME,
+                                          settings.DEFAULT_REALM)
+        except kerberos.BasicAuthError:
+            return False
+
+
+class InMemoryPrincipal(object):
+    def __init__(self, kdc, name, password=None):
+        self._kdc = kdc
+        self.name = name
+        self.password = password
+        self.kvno = 1
+        self.attributes = set()
+        self.pwexpire = None
+
+    def randomize_key(self):
+        self._kdc.delay()
+        with self._kdc.lock:
+            self.password = None
+            self.kvno += 1
+
+    def change_password(self, password):
+        self._kdc.delay()
+        with self._kdc.lock:
+            self.password = password
+            self.kvno += 1
+
+    def disable(self):
+        self.attributes.add(KerberosAttribute.DISALLOW_ALL_TIX.value)
+
+    def enable(self):
+        self.attributes.discard(KerberosAttribute.DISALLOW_ALL_TIX.value)
+
+
+class InMemoryKadmin(object):
+    """Implements the subset of the python-kadmin handle API that idm-auth uses"""
+
+    def __init__(self, kdc):
+        self._kdc = kdc
+
+    def principal_exists(self, name):
+        self._kdc.delay()
+        return self._kdc.normalize(name) in self._kdc.principals
+
+    def add_principal(self, name, password=None):
+        self._kdc.delay()
+        name = self._kdc.normalize(name)
+        with self._kdc.lock:
+            if name in self._kdc.principals:
+                raise ValueError("Principal {} already exists".format(name))
+            self._kdc.principals[name] = InMemoryPrincipal(self._kdc, name, password)
+
+    def delete_principal(self, name):
+        self._kdc.delay()
+        with self._kdc.lock:
+            del self._kdc.principals[self._kdc.normalize(name)]
+
+    def rename_principal(self, name, new_name):
+        self._kdc.delay()
+        name, new_name = self._kdc.normalize(name), self._kdc.normalize(new_name)
+        with self._kdc.lock:
+            if new_name in self._kdc.principals:
+                raise ValueError("Principal {} already exists".format(new_name))
+            principal = self._kdc.principals.pop(name)
+            principal.name = new_name
+            self._kdc.principals[new_name] = principal
+
+    def get_principal(self, name):
+        self._kdc.delay()
+        return self._kdc.principals.get(self._kdc.normalize(name))
+
+    def change_password(self, name, password):
+        self._kdc.principals[self._kdc.normalize(name)].change_password(password)
+
+
+class InMemoryKDC(BaseKDC):
+    """
+    A stand-in for a KDC, for tests and benchmarks
+
+    Principals live in memory for the life of the process. Pass a `latency` option (in seconds) to simulate the round
+    trip to kadmind and the KDC for each operation.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.latency = options.get('latency', 0)
+        self.principals = {}
+        self.lock = threading.RLock()
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def normalize(self, name):
+        return name.split('@', 1)[0]
+
+    def get_kadmin(self):
+        return InMemoryKadmin(self)
+
+    def check_password(self, principal, password):
+        self.delay()
+        principal = self.principals.get(self.normalize(principal))
+        return bool(principal and
+                    principal.password is not None and
+                    KerberosAttribute.DISALLOW_ALL_TIX.value not in principal.attributes and
+                    principal.password == password)
+
+    def reset(self):
+        with self.lock:
+            self.principals.clear()
+
+
+_kdc = None
+
+
+def get_kdc():
+    global _kdc
+    if _kdc is None:
+        config = getattr(settings, 'KERBEROS_KDC', {})
+        backend = import_string(config.get('BACKEND', 'idm_auth.kerberos.kdc.KadminKDC'))
+        _kdc = backend(**config.get('OPTIONS', {}))
+    return _kdc
+
+
+def reset_kdc(setting, **kwargs):
+    global _kdc
+    if setting == 'KERBEROS_KDC':
+        _kdc = None
+
+setting_changed.connect(reset_kdc)
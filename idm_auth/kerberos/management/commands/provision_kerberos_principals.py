@@ -0,0 +1,140 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+
+from idm_auth.kerberos.apps import get_kadmin
+
+
+class Command(BaseCommand):
+    help = "Provisions (or renames) Kerberos principals for users with usernames, using a pool of kadmin handles"
+
+    def add_arguments(self, parser):
+        assert isinstance(parser, argparse.ArgumentParser)
+        parser.add_argument('--user', dest='users', action='append', default=[],
+                            help='Only consider the user with this id (may be given more than once)')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Number of parallel kadmin handles to use')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Number of users to write back to the database at a time')
+        parser.add_argument('--resume-after',
+                            help='Skip users with ids up to and including this one, as printed by a previous run')
+        parser.add_argument('--include-local-passwords', action='store_true', default=False,
+                            help='Also move users with a usable locally-stored password onto a new principal with a '
+                                 'random key. They will need to reset their password.')
+        parser.add_argument('--dry-run', action='store_true', default=False)
+
+    def handle(self, **opts):
+        if opts['workers'] < 1 or opts['batch_size'] < 1:
+            raise CommandError("--workers and --batch-size must be positive")
+
+        self.local = threading.local()
+        self.include_local_passwords = opts['include_local_passwords']
+        # Users are processed in pk order, so everything before the first failure is safe to resume after
+        self.first_failed = None
+
+        User = get_user_model()
+        queryset = User.objects.filter(username__isnull=False).exclude(username='').order_by('pk')
+        if opts['users']:
+            queryset = queryset.filter(pk__in=opts['users'])
+        if opts['resume_after']:
+            queryset = queryset.filter(pk__gt=opts['resume_after'])
+        queryset = queryset.only('pk', 'username', 'password')
+
+        provisioned, failed, start = 0, 0, time.time()
+        with ThreadPoolExecutor(max_workers=opts['workers']) as executor:
+            batch = []
+            for user in queryset.iterator():
+                if self.needs_provisioning(user):
+                    batch.append(user)
+                if len(batch) >= opts['batch_size']:
+                    done, errors = self.process_batch(executor, batch, opts['dry_run'])
+                    provisioned, failed, batch = provisioned + done, failed + errors, []
+                    self.report(provisioned, failed, start)
+            if batch:
+                done, errors = self.process_batch(executor, batch, opts['dry_run'])
+                provisioned, failed = provisioned + done, failed + errors
+        self.report(provisioned, failed, start)
+
+        if failed:
+            raise CommandError("{} users could not be provisioned, the first being {}; re-run to retry them".format(
+                failed, self.first_failed))
+
+    def needs_provisioning(self, user):
+        if user.password.startswith('kerberos$'):
+            return user.password.split('$', 2)[2] != user.username
+        return self.include_local_passwords or not user.has_usable_password()
+
+    def get_kadmin(self):
+        # Each worker thread keeps its own kadmin handle, as they can't be shared between threads
+        if getattr(self.local, 'kadmin', None) is None:
+            self.local.kadmin = get_kadmin()
+        return self.local.kadmin
+
+    def provision(self, user):
+        kadmin = self.get_kadmin()
+        if user.password.startswith('kerberos$'):
+            principal = user.password.split('$', 2)[2]
+            # A previous run may have renamed it without managing to write back the new password
+            if not kadmin.principal_exists(user.username):
+                kadmin.rename_principal(principal, user.username)
+        elif not kadmin.principal_exists(user.username):
+            kadmin.add_principal(user.username)
+            kadmin.get_principal(user.username).randomize_key()
+        kvno = kadmin.get_principal(user.username).kvno
+        return 'kerberos${}${}'.format(kvno, user.username)
+
+    def safe_provision(self, user):
+        try:
+            return self.provision(user)
+        except Exception as e:
+            self.stderr.write("Failed to provision principal for {} ({}): {}".format(user.pk, user.username, e))
+            # Drop the handle in case it was the cause of the problem
+            self.local.kadmin = None
+            return None
+
+    def describe(self, user):
+        if user.password.startswith('kerberos$'):
+            return "rename {} to {}".format(user.password.split('$', 2)[2], user.username)
+        return "create {} with a random key".format(user.username)
+
+    def process_batch(self, executor, batch, dry_run):
+        if dry_run:
+            # Don't touch the KDC at all, so it and the database stay in step
+            for user in batch:
+                self.stdout.write("Would {} for {}".format(self.describe(user), user.pk))
+            return len(batch), 0
+
+        passwords = {}
+        for user, password in zip(batch, executor.map(self.safe_provision, batch)):
+            if password is not None:
+                passwords[user.pk] = password
+
+        if passwords:
+            # Written back in one UPDATE, bypassing User.save() so we don't repeat the rename checks
+            User = get_user_model()
+            with transaction.atomic():
+                User.objects.filter(pk__in=passwords).update(password=Case(
+                    *[When(pk=pk, then=Value(password)) for pk, password in passwords.items()],
+                    output_field=CharField()))
+
+        if self.first_failed is None:
+            failures = [user.pk for user in batch if user.pk not in passwords]
+            if failures:
+                self.first_failed = failures[0]
+                self.stdout.write("First failure at {}; later batches won't be reported as committed".format(
+                    self.first_failed))
+            else:
+                # Only while every batch so far has succeeded, so that resuming after this can't skip a failure
+                self.stdout.write("Committed up to {}".format(batch[-1].pk))
+        return len(passwords), len(batch) - len(passwords)
+
+    def report(self, provisioned, failed, start):
+        elapsed = time.time() - start
+        self.stdout.write("{} provisioned, {} failed in {:.1f}s ({:.1f} users/s)".format(
+            provisioned, failed, elapsed, provisioned / elapsed if elapsed else 0))
@@ -24,6 +24,8 @@ class KerberosBackedUserMixin(object):
                     kadmin.delete_principal(principal)
             self.password = make_password(raw_password)
         self._password = raw_password
+        # Tells idm_auth.session_backend.user_saved to revoke the user's sessions, even if raw_password is None
+        self._password_changed = True
 
     def check_password(self, raw_password):
         """
@@ -35,6 +37,7 @@ class KerberosBackedUserMixin(object):
             self.set_password(raw_password)
             # Password hash upgrades shouldn't be considered password changes.
             self._password = None
+            self._password_changed = False
             self.save(update_fields=["password"])
         return check_password(raw_password, self.password, setter, preferred=preferred)
 
@@ -0,0 +1,28 @@
+import contextlib
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def cache_lock(key, timeout=10):
+    """
+    Serializes a block of code across processes, using cache.add() on the shared cache
+
+    The lock expires after `timeout` seconds in case its holder dies; a waiter that gives up after that long proceeds
+    regardless. It only serializes across processes if CACHE_SHARED says they share the cache; callers that need that
+    regardless should check CACHE_SHARED and lock a database row instead.
+    """
+    deadline = time.time() + timeout
+    while not cache.add(key, True, timeout):
+        if time.time() > deadline:
+            logger.warning("Timed out waiting for %s; proceeding anyway", key)
+            break
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        cache.delete(key)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import socket
+import time
+
+from aiohttp import web
+from django.core.management import BaseCommand
+
+from idm_auth import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Measures how many concurrent slow upstream calls the ASGI proxied API can sustain in a single process, "
+            "against a local upstream that delays every response")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--upstream-delay', type=float, default=1.0,
+                            help='Seconds the fake upstream takes to respond')
+        parser.add_argument('--body-size', type=int, default=16 * 1024)
+        parser.add_argument('--concurrency', default='10,100,500',
+                            help='Comma-separated numbers of simultaneous proxied calls')
+
+    def handle(self, **opts):
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(self.run(opts))
+        finally:
+            loop.close()
+        self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+
+    async def run(self, opts):
+        from idm_auth.asgi import AsyncProxiedAPI
+
+        body = b'x' * opts['body_size']
+
+        async def slow_upstream(request):
+            await asyncio.sleep(opts['upstream_delay'])
+            return web.Response(body=body, content_type='application/octet-stream')
+
+        upstream = web.Application()
+        upstream.router.add_get('/{path:.*}', slow_upstream)
+        runner = web.AppRunner(upstream)
+        await runner.setup()
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        await web.SockSite(runner, sock).start()
+
+        class BenchmarkProxiedAPI(AsyncProxiedAPI):
+            # Token checks and credential lookups are measured elsewhere; this is about waiting on upstream
+            def get_credentials(self, access_token, site_url):
+                return {'access_token': 'benchmark'}
+
+        proxied_api = BenchmarkProxiedAPI('http://127.0.0.1:{}/'.format(port), 'benchmark', 'benchmark')
+        results = {}
+        try:
+            for concurrency in [int(c) for c in opts['concurrency'].split(',')]:
+                results[str(concurrency)] = await self.run_level(proxied_api, concurrency, opts['upstream_delay'])
+        finally:
+            await proxied_api.close()
+            await runner.cleanup()
+        return results
+
+    async def run_level(self, proxied_api, concurrency, upstream_delay):
+        async def call():
+            scope = {'type': 'http', 'method': 'GET', 'path': '/proxied-api/benchmark/record',
+                     'query_string': b'', 'headers': [(b'authorization', b'Bearer benchmark')]}
+            statuses, received = [], 0
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                nonlocal received
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                else:
+                    received += len(message.get('body', b''))
+
+            start = time.perf_counter()
+            await proxied_api(scope, receive, send, 'record')
+            return time.perf_counter() - start, statuses[0], received
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*[call() for i in range(concurrency)])
+        duration = time.perf_counter() - start
+        latencies = [latency for latency, status, received in outcomes if status == 200]
+        return {
+            'completed': len(latencies),
+            'failed': concurrency - len(latencies),
+            'duration_s': duration,
+            'calls_per_s': len(latencies) / duration,
+            # How many upstream calls were in flight at once, on average; a sync worker manages one
+            'mean_in_flight': sum(latencies) / duration,
+            'overhead_ms': 1000 * (duration - upstream_delay),
+            'latency': benchmark.summarize(latencies),
+        }
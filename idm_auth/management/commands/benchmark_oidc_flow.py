@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+import uuid
+from unittest import mock
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from django.core.management import BaseCommand
+from django.db import connection, connections
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from idm_auth import benchmark
+
+REDIRECT_URI = 'https://relying-party.example/callback'
+SCOPE = 'openid profile email name identity'
+STEPS = ('authorize', 'token', 'userinfo')
+
+
+def fake_identity_data(identity_id):
+    """Stands in for idm-core, which would otherwise be asked for the identity behind the claims"""
+    return {
+        '@type': 'Person',
+        'state': 'active',
+        'primary_name': {'plain': 'Alice Hacker', 'given': 'Alice', 'family': 'Hacker',
+                         'first': 'Alice', 'last': 'Hacker'},
+        'emails': [{'value': 'alice-{}@example.org'.format(identity_id), 'validated': True}],
+    }
+
+
+class Command(BaseCommand):
+    help = ("Measures the authorize → code → token → userinfo flow driven by relying parties, using the test client "
+            "against a throwaway test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flows', type=int, default=50,
+                            help='How many flows to run at each concurrency level')
+        parser.add_argument('--concurrency', default='1,4,8',
+                            help='Comma-separated numbers of threads to run flows from')
+        parser.add_argument('--userinfo-calls', type=int, default=3,
+                            help='How many times each relying party calls userinfo with its access token')
+        parser.add_argument('--keepdb', action='store_true', default=False)
+
+    def handle(self, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=opts['keepdb'])
+        try:
+            with mock.patch('idm_auth.auth_core_integration.utils.get_identity_data', fake_identity_data):
+                client = self.create_client()
+                results = {}
+                for concurrency in [int(c) for c in opts['concurrency'].split(',')]:
+                    results[str(concurrency)] = self.run_level(client, concurrency, opts['flows'],
+                                                               opts['userinfo_calls'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=opts['keepdb'])
+            teardown_test_environment()
+        self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+
+    def create_client(self):
+        from Cryptodome.PublicKey import RSA
+        from oidc_provider.models import Client, RSAKey
+
+        if not RSAKey.objects.exists():
+            RSAKey.objects.create(key=RSA.generate(2048).exportKey('PEM').decode())
+        client = Client(name='Benchmark', client_id=uuid.uuid4().hex, client_secret=uuid.uuid4().hex,
+                        client_type='confidential', response_type='code', require_consent=False)
+        client.redirect_uris = [REDIRECT_URI]
+        client.save()
+        return client
+
+    def run_level(self, client, concurrency, flows, userinfo_calls):
+        from idm_auth.models import User
+
+        samples = {step: [] for step in STEPS}
+        queries = {step: [] for step in STEPS}
+        errors = []
+        lock = threading.Lock()
+        remaining = iter(range(flows))
+
+        def worker():
+            test_client = TestClient()
+            test_client.force_login(User.objects.create(identity_id=uuid.uuid4(), primary=True))
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    try:
+                        for step, duration, query_count in self.run_flow(test_client, client, userinfo_calls):
+                            with lock:
+                                samples[step].append(duration)
+                                queries[step].append(query_count)
+                    except AssertionError as e:
+                        with lock:
+                            errors.append(str(e))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for i in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+
+        steps = {}
+        for step in STEPS:
+            steps[step] = benchmark.summarize(samples[step])
+            steps[step]['queries_mean'] = sum(queries[step]) / len(queries[step]) if queries[step] else None
+        return {
+            'flows': flows - len(errors),
+            'errors': errors[:10],
+            'error_count': len(errors),
+            'duration_s': duration,
+            'flows_per_s': (flows - len(errors)) / duration,
+            'steps': steps,
+        }
+
+    def run_flow(self, test_client, client, userinfo_calls):
+        """Yields (step, duration, query count) for each request made in a single flow"""
+        response, duration, query_count = self.measure(test_client.get, '/openid/authorize/?' + urlencode({
+            'client_id': client.client_id,
+            'response_type': 'code',
+            'redirect_uri': REDIRECT_URI,
+            'scope': SCOPE,
+            'state': uuid.uuid4().hex,
+        }))
+        assert response.status_code == 302, 'authorize returned {}'.format(response.status_code)
+        code = parse_qs(urlsplit(response['Location']).query)['code'][0]
+        yield 'authorize', duration, query_count
+
+        response, duration, query_count = self.measure(test_client.post, '/openid/token/', {
+            'grant_type': 'authorization_code',
+            'code': code,
+            'redirect_uri': REDIRECT_URI,
+            'client_id': client.client_id,
+            'client_secret': client.client_secret,
+        })
+        assert response.status_code == 200, 'token returned {}'.format(response.status_code)
+        access_token = response.json()['access_token']
+        yield 'token', duration, query_count
+
+        for i in range(userinfo_calls):
+            response, duration, query_count = self.measure(test_client.get, '/openid/userinfo/',
+                                                           HTTP_AUTHORIZATION='Bearer ' + access_token)
+            assert response.status_code == 200, 'userinfo returned {}'.format(response.status_code)
+            yield 'userinfo', duration, query_count
+
+    def measure(self, method, *args, **kwargs):
+        # connection is thread-local, so this only captures the queries made by this thread
+        with CaptureQueriesContext(connection) as queries:
+            duration, response = benchmark.time_call(method, *args, **kwargs)
+        return response, duration, len(queries)
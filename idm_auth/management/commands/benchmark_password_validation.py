@@ -0,0 +1,43 @@
+import json
+
+from django.core.management import BaseCommand
+
+from idm_auth import benchmark
+from idm_auth.forms import SetPasswordForm
+from idm_auth.request_cache import RequestCacheMiddleware
+
+
+class Command(BaseCommand):
+    help = "Measures how long it takes to validate a password form submission, with and without the request cache"
+
+    passwords = ['password', 'correct horse battery staple', 'Tr0ub4dor&3', 'qwertyuiop12345',
+                 'an unusually long passphrase with quite a lot of words in it']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--validations-per-request', type=int, default=2,
+                            help='How many times each submission is validated; form wizards validate the final step '
+                                 'again when they finish')
+
+    def handle(self, **opts):
+        results = {}
+        for label, use_request_cache in (('uncached', False), ('request_cache', True)):
+            samples = []
+            for i in range(opts['iterations']):
+                for password in self.passwords:
+                    duration, _ = benchmark.time_call(self.submit, password, opts['validations_per_request'],
+                                                      use_request_cache)
+                    samples.append(duration)
+            results[label] = benchmark.summarize(samples)
+        self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+
+    def submit(self, password, validations, use_request_cache):
+        middleware = RequestCacheMiddleware()
+        if use_request_cache:
+            middleware.process_request(None)
+        try:
+            for i in range(validations):
+                SetPasswordForm(data={'new_password1': password, 'new_password2': password}).is_valid()
+        finally:
+            if use_request_cache:
+                middleware.process_response(None, None)
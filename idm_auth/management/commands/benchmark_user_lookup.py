@@ -0,0 +1,72 @@
+import json
+import random
+import uuid
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from idm_auth import benchmark
+
+
+class Command(BaseCommand):
+    help = "Measures the bulk user lookup endpoint at its key limit, against a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--keys', type=int, default=None,
+                            help='Keys per lookup; defaults to USER_LOOKUP_MAX_KEYS')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--keepdb', action='store_true', default=False)
+
+    def handle(self, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=opts['keepdb'])
+        try:
+            users = self.create_users(opts['users'])
+            keys = opts['keys'] or getattr(settings, 'USER_LOOKUP_MAX_KEYS', 5000)
+            samples, query_counts = [], set()
+            test_client = TestClient()
+            for i in range(opts['iterations']):
+                body = json.dumps(self.lookup_body(users, keys))
+                with CaptureQueriesContext(connection) as queries:
+                    duration, response = benchmark.time_call(test_client.post, '/api/user/lookup/', body,
+                                                             content_type='application/json')
+                assert response.status_code == 200, 'lookup returned {}'.format(response.status_code)
+                samples.append(duration)
+                query_counts.add(len(queries))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=opts['keepdb'])
+            teardown_test_environment()
+        self.stdout.write(json.dumps({
+            'users': opts['users'],
+            'keys': keys,
+            'queries': sorted(query_counts),
+            'latency': benchmark.summarize(samples),
+        }, indent=2, sort_keys=True))
+
+    def create_users(self, count):
+        from idm_auth.models import User
+        users = [User(identity_id=uuid.uuid4(), username='user{}'.format(i), primary=True) for i in range(count)]
+        User.objects.bulk_create(users, batch_size=5000)
+        # Give the planner statistics, as a table that's been in use would have; otherwise early lookups are planned as
+        # if the table were empty until autovacuum gets round to it
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(User._meta.db_table))
+        return users
+
+    def lookup_body(self, users, keys):
+        """An even mix of key types, a tenth of which won't match anyone"""
+        body = {'id': [], 'identity_id': [], 'username': [], 'principal_name': []}
+        for i, user in enumerate(random.sample(users, keys)):
+            if i % 10 == 0:
+                user = type(user)(id=uuid.uuid4(), identity_id=uuid.uuid4(), username='missing{}'.format(i))
+            key_type = ('id', 'identity_id', 'username', 'principal_name')[i % 4]
+            if key_type == 'principal_name':
+                body[key_type].append('{}@{}'.format(user.username, settings.DEFAULT_REALM))
+            else:
+                body[key_type].append(str(getattr(user, key_type)))
+        return body
@@ -0,0 +1,84 @@
+import json
+import uuid
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework import serializers
+
+from idm_auth import benchmark
+from idm_auth.models import User
+from idm_auth.serializers import UserSerializer
+
+
+class ReferenceUserSerializer(serializers.HyperlinkedModelSerializer):
+    """UserSerializer as it would be if left to DRF, for comparison"""
+    principal_name = serializers.SerializerMethodField()
+
+    def get_principal_name(self, instance):
+        return '{}@{}'.format(instance.username, settings.DEFAULT_REALM) if instance.username else None
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['@type'] = 'User'
+        return data
+
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'primary', 'identity_id', 'principal_name')
+
+
+class Command(BaseCommand):
+    help = ("Measures how many users a second UserSerializer can serialize, in bulk (as for API pages) and one at a "
+            "time (as for broker notifications), against DRF's own serialization, using a throwaway test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--keepdb', action='store_true', default=False)
+
+    def handle(self, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=opts['keepdb'])
+        try:
+            results = self.run(opts['users'], opts['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=opts['keepdb'])
+            teardown_test_environment()
+        self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+
+    def run(self, count, iterations):
+        User.objects.bulk_create([User(identity_id=uuid.uuid4() if i % 10 else None,
+                                       username='user{}'.format(i),
+                                       primary=bool(i % 2))
+                                  for i in range(count)], batch_size=5000)
+        queryset = User.objects.order_by('id')
+        instances = list(queryset)
+
+        cases = {
+            # Including fetching the rows, as for a page of the API
+            'bulk': {
+                'before': lambda: ReferenceUserSerializer(queryset.all(), many=True).data,
+                'after': lambda: UserSerializer(queryset.all(), many=True).data,
+            },
+            # A new serializer for each instance, as for broker notifications
+            'single': {
+                'before': lambda: [ReferenceUserSerializer(instance).data for instance in instances],
+                'after': lambda: [UserSerializer(instance).data for instance in instances],
+            },
+        }
+
+        results = {}
+        for case, variants in sorted(cases.items()):
+            outputs = {variant: json.loads(json.dumps(func())) for variant, func in variants.items()}
+            assert outputs['before'] == outputs['after'], 'Representations differ for {}'.format(case)
+            results[case] = {}
+            for variant, func in sorted(variants.items()):
+                samples = [benchmark.time_call(func)[0] for i in range(iterations)]
+                results[case][variant] = benchmark.summarize(samples)
+                results[case][variant]['rows_per_s'] = count * len(samples) / sum(samples)
+            results[case]['speedup'] = results[case]['after']['rows_per_s'] / results[case]['before']['rows_per_s']
+        results['users'] = count
+        return results
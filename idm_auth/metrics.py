@@ -0,0 +1,60 @@
+"""
+Simple in-process metrics
+
+Counters, gauges and timings are kept per process and exposed as JSON by idm_auth.views.MetricsView. Gauges may be
+given a callable, which is evaluated whenever a snapshot is taken.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+_lock = threading.Lock()
+_counters = collections.Counter()
+_gauges = {}
+_timings = {}
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def timing(name, seconds):
+    with _lock:
+        count, total, maximum = _timings.get(name, (0, 0.0, 0.0))
+        _timings[name] = (count + 1, total + seconds, max(maximum, seconds))
+
+
+@contextlib.contextmanager
+def timer(name):
+    start = time.time()
+    try:
+        yield
+    finally:
+        timing(name, time.time() - start)
+
+
+def snapshot():
+    with _lock:
+        counters, gauges, timings = dict(_counters), dict(_gauges), dict(_timings)
+    return {
+        'counters': counters,
+        'gauges': {name: value() if callable(value) else value for name, value in gauges.items()},
+        'timings': {name: {'count': count,
+                           'mean': total / count,
+                           'max': maximum} for name, (count, total, maximum) in timings.items()},
+    }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
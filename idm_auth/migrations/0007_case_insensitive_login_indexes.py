@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Expression indexes to support the case-insensitive (UPPER(...) = UPPER(...)) lookups made by
+    idm_auth.models.resolve_login_user.
+    """
+
+    dependencies = [
+        ('idm_auth', '0006_useremail'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX idm_auth_user_username_upper ON idm_auth_user (UPPER(username::text))',
+            'DROP INDEX idm_auth_user_username_upper',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX idm_auth_useremail_email_upper ON idm_auth_useremail (UPPER(email::text))',
+            'DROP INDEX idm_auth_useremail_email_upper',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_django', '0008_partial_timestamp'),
+        ('idm_auth', '0007_case_insensitive_login_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedPartial',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+            },
+            bases=('social_django.partial',),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes on oidc_provider's expiry columns, so that idm_auth.tasks.oidc.purge_expired_oidc_grants can find expired
+    codes and tokens without scanning the tables.
+
+    They're built concurrently so as not to block writes to the busy token table while they're built, which can't be
+    done in a transaction.
+    """
+    atomic = False
+
+    dependencies = [
+        ('idm_auth', '0009_usersession'),
+        ('oidc_provider', '0022_auto_20170331_1626'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY idm_auth_oidc_code_expires_at ON oidc_provider_code (expires_at)',
+            'DROP INDEX CONCURRENTLY idm_auth_oidc_code_expires_at',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY idm_auth_oidc_token_expires_at ON oidc_provider_token (expires_at)',
+            'DROP INDEX CONCURRENTLY idm_auth_oidc_token_expires_at',
+        ),
+    ]
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+CREATE_TRIGGERS = """
+CREATE FUNCTION idm_auth_user_changed() RETURNS trigger AS $$
+BEGIN
+    -- Updates that only touch last_login (i.e. logging in) or the feed's own columns aren't changes. The columns are
+    -- listed explicitly (rather than compared as jsonb) for PostgreSQL 9.4, so any added later must be added here.
+    IF TG_OP = 'UPDATE' AND
+            ROW(NEW.id, NEW.password, NEW.is_superuser, NEW.username, NEW.first_name, NEW.last_name, NEW.email,
+                NEW.is_staff, NEW.is_active, NEW.date_joined, NEW.identity_id, NEW.identity_type, NEW."primary",
+                NEW.must_have_password, NEW.must_have_mfa, NEW.must_use_password, NEW.state, NEW.date_of_birth)
+            IS NOT DISTINCT FROM
+            ROW(OLD.id, OLD.password, OLD.is_superuser, OLD.username, OLD.first_name, OLD.last_name, OLD.email,
+                OLD.is_staff, OLD.is_active, OLD.date_joined, OLD.identity_id, OLD.identity_type, OLD."primary",
+                OLD.must_have_password, OLD.must_have_mfa, OLD.must_use_password, OLD.state, OLD.date_of_birth) THEN
+        NEW.change_xid := OLD.change_xid;
+        NEW.change_seq := OLD.change_seq;
+        NEW.created_xid := OLD.created_xid;
+        NEW.created_seq := OLD.created_seq;
+        NEW.changed_at := OLD.changed_at;
+        RETURN NEW;
+    END IF;
+    NEW.change_xid := txid_current();
+    NEW.change_seq := nextval('idm_auth_user_change_seq');
+    NEW.changed_at := clock_timestamp();
+    IF TG_OP = 'INSERT' THEN
+        NEW.created_xid := NEW.change_xid;
+        NEW.created_seq := NEW.change_seq;
+    ELSE
+        NEW.created_xid := OLD.created_xid;
+        NEW.created_seq := OLD.created_seq;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER idm_auth_user_changed BEFORE INSERT OR UPDATE ON idm_auth_user
+    FOR EACH ROW EXECUTE PROCEDURE idm_auth_user_changed();
+
+CREATE FUNCTION idm_auth_user_deleted() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO idm_auth_usertombstone (id, identity_id, change_xid, change_seq, changed_at)
+        VALUES (OLD.id, OLD.identity_id, txid_current(), nextval('idm_auth_user_change_seq'), clock_timestamp());
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER idm_auth_user_deleted AFTER DELETE ON idm_auth_user
+    FOR EACH ROW EXECUTE PROCEDURE idm_auth_user_deleted();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER idm_auth_user_deleted ON idm_auth_user;
+DROP FUNCTION idm_auth_user_deleted();
+DROP TRIGGER idm_auth_user_changed ON idm_auth_user;
+DROP FUNCTION idm_auth_user_changed();
+"""
+
+
+class Migration(migrations.Migration):
+    """
+    A change sequence for users, assigned by triggers so that queryset updates and cascading deletes are recorded too.
+
+    Each change records the id of the transaction that made it as well as a sequence number, so that the feed can
+    order changes by transaction and hold back those made by transactions that might not have committed yet.
+    """
+
+    dependencies = [
+        ('idm_auth', '0010_oidc_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='change_xid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='change_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='created_xid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='created_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='changed_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='UserTombstone',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('identity_id', models.UUIDField(null=True)),
+                ('change_xid', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunSQL(
+            'CREATE SEQUENCE idm_auth_user_change_seq',
+            'DROP SEQUENCE idm_auth_user_change_seq',
+        ),
+        migrations.RunSQL(
+            "UPDATE idm_auth_user SET change_xid = txid_current(), change_seq = nextval('idm_auth_user_change_seq'),"
+            " changed_at = now();"
+            "UPDATE idm_auth_user SET created_xid = change_xid, created_seq = change_seq",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX idm_auth_user_change ON idm_auth_user (change_xid, change_seq)',
+            'DROP INDEX idm_auth_user_change',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX idm_auth_usertombstone_change ON idm_auth_usertombstone (change_xid, change_seq)',
+            'DROP INDEX idm_auth_usertombstone_change',
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ('idm_auth_user_username_trgm', 'idm_auth_user', 'username'),
+    ('idm_auth_user_first_name_trgm', 'idm_auth_user', 'first_name'),
+    ('idm_auth_user_last_name_trgm', 'idm_auth_user', 'last_name'),
+    ('idm_auth_user_email_trgm', 'idm_auth_user', 'email'),
+    ('idm_auth_useremail_email_trgm', 'idm_auth_useremail', 'email'),
+]
+
+
+class Migration(migrations.Migration):
+    """
+    Trigram indexes to support the admin's case-insensitive substring (UPPER(...) LIKE UPPER('%...%')) searches on
+    users, which would otherwise scan the whole table.
+
+    They need the pg_trgm extension, which is created here if it isn't already. That needs a role allowed to create
+    extensions, so otherwise have a superuser run CREATE EXTENSION pg_trgm in the database first. As in 0010, the
+    indexes are built concurrently so as not to block writes to the user tables, which can't be done in a transaction.
+    """
+    atomic = False
+
+    dependencies = [
+        ('idm_auth', '0011_user_change_feed'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY {} ON {} USING gin (UPPER({}::text) gin_trgm_ops)'.format(name, table, column),
+            'DROP INDEX CONCURRENTLY {}'.format(name),
+        ) for name, table, column in TRIGRAM_INDEXES
+    ]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import itertools
+import uuid
+
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def get_user_id(session_data):
+    # The session hash is salted with the store's class name, so this has to be decoded by a class named SessionStore
+    try:
+        return uuid.UUID(SessionStore().decode(session_data)[SESSION_KEY])
+    except (KeyError, ValueError):
+        return None
+
+
+def copy_sessions(apps, schema_editor):
+    Session = apps.get_model('sessions', 'Session')
+    UserSession = apps.get_model('idm_auth', 'UserSession')
+    User = apps.get_model('idm_auth', 'User')
+
+    sessions = Session.objects.filter(expire_date__gt=timezone.now()).order_by('session_key').iterator()
+    while True:
+        batch = [UserSession(session_key=session.session_key,
+                             session_data=session.session_data,
+                             expire_date=session.expire_date,
+                             user_id=get_user_id(session.session_data))
+                 for session in itertools.islice(sessions, BATCH_SIZE)]
+        if not batch:
+            break
+        # Sessions can outlive their users in the old table, which didn't reference them
+        user_ids = set(User.objects.filter(pk__in={s.user_id for s in batch if s.user_id})
+                                   .values_list('pk', flat=True))
+        for session in batch:
+            if session.user_id not in user_ids:
+                session.user_id = None
+        existing = set(UserSession.objects.filter(session_key__in=[s.session_key for s in batch])
+                                          .values_list('session_key', flat=True))
+        UserSession.objects.bulk_create([s for s in batch if s.session_key not in existing])
+
+
+class Migration(migrations.Migration):
+    """
+    Copies unexpired sessions from django.contrib.sessions' table into idm_auth_usersession, so that switching
+    SESSION_ENGINE to idm_auth.session_backend doesn't log everyone out.
+
+    The old table is left as it was, so switching back still works; it can be emptied once the new engine is in use.
+    Sessions created by processes still running the old engine after this has run are lost.
+    """
+
+    dependencies = [
+        ('idm_auth', '0012_user_search_indexes'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_sessions, migrations.RunPython.noop),
+    ]
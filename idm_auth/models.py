@@ -1,12 +1,20 @@
+import datetime
+import json
 import uuid
+import zlib
 
 import re
 from dirtyfields import DirtyFieldsMixin
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.sessions.base_session import AbstractBaseSession
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
+from social_django.models import Partial
 
 from idm_auth.kerberos.models import KerberosBackedUserMixin
 
@@ -42,6 +50,14 @@ class User(KerberosBackedUserMixin, DirtyFieldsMixin, AbstractUser):
     state = models.CharField(max_length=32)
     date_of_birth = models.DateField(null=True, blank=True)
 
+    # Maintained by database triggers (see migration 0011) for the change feed at /api/user/changes/. The trigger
+    # lists the columns that count as changes, so new fields need adding to it in a migration.
+    change_xid = models.BigIntegerField(null=True, editable=False)
+    change_seq = models.BigIntegerField(null=True, editable=False)
+    created_xid = models.BigIntegerField(null=True, editable=False)
+    created_seq = models.BigIntegerField(null=True, editable=False)
+    changed_at = models.DateTimeField(null=True, editable=False)
+
     USERNAME_FIELD = 'id'
 
     def __str__(self):
@@ -54,3 +70,144 @@ class User(KerberosBackedUserMixin, DirtyFieldsMixin, AbstractUser):
 class UserEmail(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     email = models.EmailField(db_index=True, unique=True)
+
+
+class UserTombstone(models.Model):
+    """Records a deleted user for the change feed; inserted by a trigger when a user row is deleted"""
+    id = models.UUIDField(primary_key=True)
+    identity_id = models.UUIDField(null=True)
+    change_xid = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+
+class UserSession(AbstractBaseSession):
+    """
+    A database-backed session that records which user it belongs to
+
+    Indexing sessions by user means we can find or revoke all of a user's sessions without scanning the whole session
+    table. Deleting a user deletes their sessions. See idm_auth.session_backend.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE)
+
+    @classmethod
+    def get_session_store_class(cls):
+        from .session_backend import SessionStore
+        return SessionStore
+
+
+def resolve_login_user(identifier):
+    """
+    Finds the user a login identifier refers to.
+
+    The identifier may be a user ID, a username, or any email address we know about for the user. Usernames and email
+    addresses are matched case-insensitively, using the UPPER() indexes from migration 0007, in a single query: a
+    UNION of the two lookups, so that each can use its index. A username match beats an email address match, so a
+    username that is also someone else's email address always refers to its own user. Returns None if there's no
+    match.
+    """
+    try:
+        return User.objects.filter(pk=uuid.UUID(identifier)).first()
+    except ValueError:
+        pass
+    users = list(User.objects.filter(username__iexact=identifier).union(
+        User.objects.filter(pk__in=UserEmail.objects.filter(email__iexact=identifier).values('user_id'))))
+    for user in users:
+        if user.username == identifier:
+            return user
+    by_username = [user for user in users if user.username and user.username.upper() == identifier.upper()]
+    if by_username:
+        # Usernames that differ only in case; only an exact match is unambiguous
+        return by_username[0] if len(by_username) == 1 else None
+    return users[0] if users else None
+
+
+class CachedPartial(Partial):
+    """
+    A partial pipeline that lives primarily in the cache
+
+    Partials are stored compactly (as compressed JSON) in the default cache for SOCIAL_AUTH_PARTIAL_TTL seconds. They are
+    also written through to the database unless SOCIAL_AUTH_PARTIAL_DURABLE is false, in which case the database is
+    only consulted for partials saved before that was turned off. Expired database rows are removed by the
+    idm_auth.tasks.partials.purge_expired_partials task.
+
+    A partial destroyed in one process mustn't still be found in another's cache, so unless CACHE_SHARED says the
+    cache is shared between processes, partials are kept only in the database.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def get_ttl(cls):
+        return getattr(settings, 'SOCIAL_AUTH_PARTIAL_TTL', 3600)
+
+    @classmethod
+    def get_cache_key(cls, token):
+        return 'social-partial:' + token
+
+    @classmethod
+    def use_cache(cls):
+        return getattr(settings, 'CACHE_SHARED', False)
+
+    @classmethod
+    def load(cls, token):
+        if cls.use_cache():
+            serialized = cache.get(cls.get_cache_key(token))
+            if serialized is not None:
+                return cls.deserialize(token, serialized)
+        try:
+            partial = cls.objects.get(token=token,
+                                      timestamp__gte=timezone.now() - datetime.timedelta(seconds=cls.get_ttl()))
+        except cls.DoesNotExist:
+            return None
+        if cls.use_cache():
+            cache.set(cls.get_cache_key(token), partial.serialize(), cls.get_ttl())
+        return partial
+
+    @classmethod
+    def destroy(cls, token):
+        if cls.use_cache():
+            cache.delete(cls.get_cache_key(token))
+        cls.objects.filter(token=token).delete()
+
+    def compact(self):
+        response = self.data.get('kwargs', {}).get('response')
+        if isinstance(response, dict):
+            for key in getattr(settings, 'SOCIAL_AUTH_PARTIAL_DISCARD_RESPONSE_KEYS', ()):
+                response.pop(key, None)
+
+    def serialize(self):
+        return zlib.compress(json.dumps({
+            'id': self.pk,
+            'next_step': self.next_step,
+            'backend': self.backend,
+            'data': self.data,
+            'timestamp': self.timestamp.timestamp() if self.timestamp else None,
+        }, separators=(',', ':'), cls=DjangoJSONEncoder).encode())
+
+    @classmethod
+    def deserialize(cls, token, serialized):
+        value = json.loads(zlib.decompress(serialized).decode())
+        timestamp = value['timestamp']
+        return cls(id=value['id'],
+                   token=token,
+                   next_step=value['next_step'],
+                   backend=value['backend'],
+                   data=value['data'],
+                   timestamp=datetime.datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else None)
+
+    def save(self, *args, **kwargs):
+        self.compact()
+        if getattr(settings, 'SOCIAL_AUTH_PARTIAL_DURABLE', True) or not self.use_cache():
+            super().save(*args, **kwargs)
+        elif not self.timestamp:
+            self.timestamp = timezone.now()
+        if self.use_cache():
+            cache.set(self.get_cache_key(self.token), self.serialize(), self.get_ttl())
+
+    def delete(self, *args, **kwargs):
+        if self.use_cache():
+            cache.delete(self.get_cache_key(self.token))
+        if self.pk:
+            return super().delete(*args, **kwargs)
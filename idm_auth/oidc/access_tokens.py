@@ -0,0 +1,189 @@
+"""
+Self-contained JWT access tokens
+
+When OIDC_JWT_ACCESS_TOKENS is enabled, a client can exchange its opaque access token for a signed JWT carrying the same
+user, client, scopes and expiry. Resource servers (including ProxiedAPIView) can then validate it against the cached
+signing keys without touching the database.
+
+The JWTs are signed with the same keys as id_tokens, so they carry a `token_use` claim of "access", and their audience
+is this provider (whose resource servers are the ones that validate them locally) rather than the client, which is
+given as `client_id`. Anything else signed with our keys, such as an id_token, is rejected.
+
+Deleting the underlying Token revokes the JWT. Revocations are kept in a list in the shared cache, and each process
+checks a copy of it held in memory, refreshed every OIDC_JWT_REVOCATION_REFRESH seconds.
+"""
+
+import datetime
+import functools
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from jwkest import JWKESTException
+from jwkest.jws import JWS
+from oidc_provider.lib.utils.common import get_issuer
+from oidc_provider.lib.utils.oauth2 import extract_access_token, protected_resource_view
+
+from idm_auth import metrics
+from idm_auth.locks import cache_lock
+from . import keys
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY = 'oidc-jwt-revoked'
+REVOKED_LOCK_KEY = 'oidc-jwt-revoked-lock'
+TOKEN_USE = 'access'
+
+
+class InvalidAccessToken(Exception):
+    pass
+
+
+class AccessTokenClaims(object):
+    """Presents a validated JWT with the attributes of oidc_provider's Token that resource views use"""
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.user_id = claims['uid']
+        self.scope = claims['scope'].split()
+        self.expires_at = datetime.datetime.fromtimestamp(claims['exp'], timezone.utc)
+
+    @property
+    def user(self):
+        from idm_auth.models import User
+        return User.objects.get(pk=self.user_id)
+
+
+def enabled():
+    return getattr(settings, 'OIDC_JWT_ACCESS_TOKENS', False)
+
+
+def issue(token, issuer):
+    claims = {
+        'iss': issuer,
+        'sub': token.id_token.get('sub'),
+        'aud': issuer,
+        'client_id': token.client.client_id,
+        'token_use': TOKEN_USE,
+        'uid': str(token.user_id),
+        'scope': ' '.join(token.scope),
+        'jti': str(token.pk),
+        'iat': int(time.time()),
+        'exp': int(token.expires_at.timestamp()),
+    }
+    return JWS(json.dumps(claims), alg='RS256').sign_compact(list(keys.get_key_set().signing_keys))
+
+
+def validate(jwt, issuer):
+    try:
+        claims = JWS().verify_compact(jwt, keys=list(keys.get_key_set().signing_keys))
+    except JWKESTException as e:
+        raise InvalidAccessToken(str(e)) from e
+    if not isinstance(claims, dict) or not {'uid', 'scope', 'jti', 'exp'} <= set(claims):
+        raise InvalidAccessToken('Missing claims')
+    if claims.get('token_use') != TOKEN_USE:
+        raise InvalidAccessToken('Not an access token')
+    if claims.get('iss') != issuer:
+        raise InvalidAccessToken('Wrong issuer')
+    audience = claims.get('aud')
+    if issuer not in (audience if isinstance(audience, list) else [audience]):
+        raise InvalidAccessToken('Wrong audience')
+    if claims['exp'] <= time.time():
+        raise InvalidAccessToken('Expired')
+    if claims['jti'] in _revocations.get():
+        raise InvalidAccessToken('Revoked')
+    return AccessTokenClaims(claims)
+
+
+def get_token(access_token, issuer):
+    """
+    Returns the oidc_provider Token or AccessTokenClaims for an access token of either kind
+
+    This is for callers that aren't Django views (e.g. idm_auth.asgi); views should use resource_view().
+    """
+    if enabled() and access_token.count('.') == 2:
+        return validate(access_token, issuer)
+    from oidc_provider.models import Token
+    try:
+        token = Token.objects.get(access_token=access_token)
+    except Token.DoesNotExist:
+        raise InvalidAccessToken('Unknown token')
+    if token.has_expired():
+        raise InvalidAccessToken('Expired')
+    return token
+
+
+class RevocationList(object):
+    def __init__(self):
+        self.revoked = {}
+        self.refreshed_at = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        if time.time() - self.refreshed_at > getattr(settings, 'OIDC_JWT_REVOCATION_REFRESH', 5):
+            self.refresh()
+        return self.revoked
+
+    def refresh(self):
+        with self.lock:
+            self.revoked = cache.get(REVOKED_KEY) or {}
+            self.refreshed_at = time.time()
+
+    def revoke(self, jti, expires_at):
+        with cache_lock(REVOKED_LOCK_KEY):
+            now = time.time()
+            revoked = {j: e for j, e in (cache.get(REVOKED_KEY) or {}).items() if e > now}
+            revoked[jti] = expires_at
+            cache.set(REVOKED_KEY, revoked, None)
+        self.refresh()
+
+
+_revocations = RevocationList()
+
+
+def token_deleted(instance, **kwargs):
+    """Signal receiver that revokes any JWTs issued for a deleted Token"""
+    if enabled() and instance.expires_at.timestamp() > time.time():
+        _revocations.revoke(str(instance.pk), instance.expires_at.timestamp())
+
+
+def resource_view(scopes=()):
+    """
+    Like oidc_provider's protected_resource_view, but also accepts our JWT access tokens, validating them locally
+
+    The view is passed either an oidc_provider Token or an AccessTokenClaims as `token`.
+    """
+    def wrapper(view):
+        opaque_view = protected_resource_view(list(scopes))(view)
+
+        @functools.wraps(view)
+        def view_wrapper(request, *args, **kwargs):
+            access_token = extract_access_token(request)
+            if not enabled() or access_token.count('.') != 2:
+                return opaque_view(request, *args, **kwargs)
+            try:
+                token = validate(access_token, get_issuer(request=request))
+                if not set(scopes) <= set(token.scope):
+                    metrics.incr('oidc.jwt.rejected')
+                    return _bearer_error(403, 'insufficient_scope',
+                                         'The request requires higher privileges than provided by the access token.')
+            except InvalidAccessToken as e:
+                logger.debug("Rejected JWT access token: %s", e)
+                metrics.incr('oidc.jwt.rejected')
+                return _bearer_error(401, 'invalid_token', 'The access token provided is expired, revoked, '
+                                                           'malformed, or invalid for other reasons.')
+            metrics.incr('oidc.jwt.accepted')
+            return view(request, *args, token=token, **kwargs)
+        return view_wrapper
+    return wrapper
+
+
+def _bearer_error(status, code, description):
+    response = HttpResponse(status=status)
+    response['WWW-Authenticate'] = 'error="{0}", error_description="{1}"'.format(code, description)
+    return response
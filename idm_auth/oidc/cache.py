@@ -0,0 +1,72 @@
+"""
+Short-lived caching of userinfo responses
+
+Entries are keyed by a hash of the access token; a token's scope set never changes, so this also keys them by scope.
+Each entry records the user's generation at the time it was built. Changing a user or their identity projection gives
+the user a new generation, which orphans all their cached entries at once, and revoking a token deletes its entry.
+
+Generations are bumped from Celery as well as web workers, so the cache is only used if CACHE_SHARED says every
+process sees the same one.
+"""
+
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_timeout():
+    if not getattr(settings, 'CACHE_SHARED', False):
+        return 0
+    return getattr(settings, 'OIDC_USERINFO_CACHE_TIMEOUT', 60)
+
+
+def _userinfo_key(access_token):
+    return 'oidc-userinfo:' + hashlib.sha256(access_token.encode()).hexdigest()
+
+
+def _generation_key(user_id):
+    return 'oidc-userinfo-generation:{}'.format(user_id)
+
+
+def get_generation(user_id):
+    return cache.get(_generation_key(user_id))
+
+
+def get_userinfo(token):
+    """Returns the cached userinfo claims for a (validated) token, or None if there's nothing current"""
+    if not get_timeout():
+        return None
+    entry = cache.get(_userinfo_key(token.access_token))
+    if entry is None or entry['expires_at'] <= time.time():
+        return None
+    if entry['generation'] != get_generation(entry['user_id']):
+        return None
+    return entry['claims']
+
+
+def set_userinfo(token, claims, generation):
+    """
+    Caches the userinfo claims for a token
+
+    `generation` should have been read with get_generation() before the claims were built, so that a change made in
+    the meantime isn't hidden.
+    """
+    timeout = min(get_timeout(), int(token.expires_at.timestamp() - time.time()))
+    if timeout > 0:
+        cache.set(_userinfo_key(token.access_token), {
+            'user_id': token.user_id,
+            'generation': generation,
+            'expires_at': token.expires_at.timestamp(),
+            'claims': claims,
+        }, timeout)
+
+
+def invalidate_token(access_token):
+    cache.delete(_userinfo_key(access_token))
+
+
+def invalidate_users(user_ids):
+    cache.set_many({_generation_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
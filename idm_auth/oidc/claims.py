@@ -1,26 +1,24 @@
 from django.utils.functional import cached_property
 from oidc_provider.lib.claims import ScopeClaims
 
-from idm_auth.auth_core_integration.utils import get_identity_data
+from idm_auth.auth_core_integration.models import IdentityProjection
 
 
 class IDMAuthScopeClaims(ScopeClaims):
     @cached_property
-    def profile(self):
+    def identity(self):
         if self.user.identity_id:
-            return get_identity_data(self.user.identity_id)
-        else:
-            return {}
+            return IdentityProjection.get_or_fetch(self.user.identity_id)
 
     def scope_name(self):
-        if not self.profile:
+        if not self.identity or not self.identity.has_primary_name:
             return {}
         return {
-            'name': self.profile['primary_name']['plain'],
-            'given_name': self.profile['primary_name']['given'],
-            'family_name': self.profile['primary_name']['family'],
-            'first_name': self.profile['primary_name']['first'],
-            'last_name': self.profile['primary_name']['last'],
+            'name': self.identity.name_plain,
+            'given_name': self.identity.name_given,
+            'family_name': self.identity.name_family,
+            'first_name': self.identity.name_first,
+            'last_name': self.identity.name_last,
         }
 
     info_name = ('Name', 'Your preferred name')
@@ -34,13 +32,10 @@ class IDMAuthScopeClaims(ScopeClaims):
     info_name = ('Identity', 'Your unique identifier in the IdM')
 
     def scope_email(self):
-        emails = self.profile.get('emails', [])
-        validated_emails = [e for e in emails if e['validated']]
-        emails = validated_emails or emails
-        if emails:
+        if self.identity and self.identity.email:
             return {
-                'email': emails[0]['value'],
-                'email_validated': emails[0]['validated'],
+                'email': self.identity.email,
+                'email_validated': self.identity.email_validated,
             }
         else:
             return {}
@@ -0,0 +1,105 @@
+"""
+A per-process cache of the provider's parsed RSA signing keys and the JWKS document built from them
+
+oidc_provider parses every RSAKey from the database each time it signs an id_token, and again for every JWKS request.
+Here they're parsed once, and parsed again when the RSAKey table changes. Each process checks a digest of the keys'
+ids and bodies at most every OIDC_KEYS_REFRESH seconds, so keys added, removed or replaced by any process (e.g. by
+`manage.py creatersakey`) are picked up; changes made in this process are noticed straight away.
+"""
+
+import collections
+import hashlib
+import inspect
+import json
+import threading
+import time
+
+from Cryptodome.PublicKey.RSA import importKey
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from jwkest import long_to_base64
+from jwkest.jwk import RSAKey as jwk_RSAKey
+
+KeySet = collections.namedtuple('KeySet', ('version', 'signing_keys', 'jwks', 'jwks_etag'))
+
+_lock = threading.Lock()
+_key_set = None
+_checked_at = 0
+_original_get_client_alg_keys = None
+
+
+def get_key_set():
+    global _key_set, _checked_at
+    key_set = _key_set
+    if key_set is not None and time.time() - _checked_at < getattr(settings, 'OIDC_KEYS_REFRESH', 5):
+        return key_set
+    with _lock:
+        version = _get_version()
+        _checked_at = time.time()
+        if _key_set is None or _key_set.version != version:
+            _key_set = _load_key_set(version)
+        return _key_set
+
+
+def _get_version():
+    # Fetching a handful of PEM bodies is cheap; parsing them is what the cache saves
+    from oidc_provider.models import RSAKey
+    digest = hashlib.sha1()
+    for pk, key in RSAKey.objects.order_by('id').values_list('id', 'key'):
+        digest.update('{}\n{}\n'.format(pk, key).encode())
+    return digest.hexdigest()
+
+
+def _load_key_set(version):
+    from oidc_provider.models import RSAKey
+
+    signing_keys, jwks_keys = [], []
+    for rsakey in RSAKey.objects.order_by('id'):
+        key = importKey(rsakey.key)
+        signing_keys.append(jwk_RSAKey(key=key, kid=rsakey.kid))
+        public_key = key.publickey()
+        jwks_keys.append(collections.OrderedDict([
+            ('kty', 'RSA'),
+            ('alg', 'RS256'),
+            ('use', 'sig'),
+            ('kid', rsakey.kid),
+            ('n', long_to_base64(public_key.n)),
+            ('e', long_to_base64(public_key.e)),
+        ]))
+    jwks = json.dumps({'keys': jwks_keys}).encode()
+    return KeySet(version, tuple(signing_keys), jwks, '"{}"'.format(hashlib.sha1(jwks).hexdigest()))
+
+
+def invalidate(**kwargs):
+    """Signal receiver for RSAKey changes, which makes this process reload its keys"""
+    global _key_set
+    _key_set = None
+
+
+def get_client_alg_keys(client):
+    """A replacement for oidc_provider.lib.utils.token.get_client_alg_keys that uses the cached RSA keys"""
+    if client.jwt_alg == 'RS256':
+        keys = get_key_set().signing_keys
+        if not keys:
+            raise Exception('You must add at least one RSA Key.')
+        return list(keys)
+    return _original_get_client_alg_keys(client)
+
+
+def install():
+    """
+    Makes oidc_provider sign and verify id_tokens with the cached keys
+
+    This replaces a function internal to oidc_provider, so refuses to start if it's gone or changed its signature,
+    rather than silently going back to reading and parsing keys for every token.
+    """
+    global _original_get_client_alg_keys
+    from oidc_provider.lib.utils import token
+
+    original = getattr(token, 'get_client_alg_keys', None)
+    if not callable(original) or list(inspect.signature(original).parameters) != ['client']:
+        raise ImproperlyConfigured("idm_auth.oidc.keys expects oidc_provider.lib.utils.token to have "
+                                   "get_client_alg_keys(client), but found {!r}".format(original))
+    if _original_get_client_alg_keys is None:
+        _original_get_client_alg_keys = token.get_client_alg_keys
+        token.get_client_alg_keys = get_client_alg_keys
@@ -1,9 +1,22 @@
 import collections
+import functools
+
 from django.urls import reverse
 from rest_framework import renderers
 from rest_framework.request import Request
 
 
+@functools.lru_cache()
+def endpoint_paths():
+    return collections.OrderedDict([
+        ('issuer', reverse('index')),
+        ('authorization_endpoint', reverse('oidc_provider:authorize')),
+        ('token_endpoint', reverse('oidc_provider:token')),
+        ('userinfo_endpoint', reverse('oidc_provider:userinfo')),
+        ('jwks_uri', reverse('oidc_provider:jwks')),
+    ])
+
+
 class DjangoOIDCAuthRenderer(renderers.JSONRenderer):
     format = 'django-oidc-auth-json'
 
@@ -11,12 +24,8 @@ class DjangoOIDCAuthRenderer(renderers.JSONRenderer):
         request = renderer_context['request']
         assert isinstance(request, Request)
 
-        return super().render(collections.OrderedDict([
-            ('issuer', request.build_absolute_uri(reverse('index'))),
-            ('authorization_endpoint', request.build_absolute_uri(reverse('oidc_provider:authorize'))),
-            ('token_endpoint', request.build_absolute_uri(reverse('oidc_provider:token'))),
-            ('userinfo_endpoint', request.build_absolute_uri(reverse('oidc_provider:userinfo'))),
-            ('jwks_uri', request.build_absolute_uri(reverse('oidc_provider:jwks'))),
-            ('client_id', data['client_id']),
-            ('client_secret', data.get('client_secret', 'FILL THIS IN')),
-        ]), accepted_media_type, renderer_context)
\ No newline at end of file
+        document = collections.OrderedDict((name, request.build_absolute_uri(path))
+                                           for name, path in endpoint_paths().items())
+        document['client_id'] = data['client_id']
+        document['client_secret'] = data.get('client_secret', 'FILL THIS IN')
+        return super().render(document, accepted_media_type, renderer_context)
\ No newline at end of file
@@ -1,8 +1,26 @@
+import collections
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.views.generic import View
+from oidc_provider import models, settings as oidc_settings
+from oidc_provider.lib.utils.common import get_issuer, get_site_url
+from oidc_provider.models import RESPONSE_TYPE_CHOICES
+from oidc_provider.lib.claims import StandardScopeClaims
+from oidc_provider.lib.utils.oauth2 import protected_resource_view
 from rest_framework import viewsets
-from oidc_provider import models
 from rest_framework.permissions import DjangoModelPermissions
 
-from . import renderers, serializers
+from idm_auth import metrics
+from . import access_tokens, cache, keys, renderers, serializers
 
 
 class ClientViewSet(viewsets.ModelViewSet):
@@ -12,3 +30,116 @@ class ClientViewSet(viewsets.ModelViewSet):
         renderers.DjangoOIDCAuthRenderer,
     ] + list(viewsets.ModelViewSet.renderer_classes)
     permission_classes = (DjangoModelPermissions,)
+
+
+def _userinfo_response(claims):
+    response = JsonResponse(claims, status=200)
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Cache-Control'] = 'no-store'
+    response['Pragma'] = 'no-cache'
+    return response
+
+
+def _build_userinfo(token):
+    generation = cache.get_generation(token.user_id)
+    claims = {'sub': token.id_token.get('sub')}
+    claims.update(StandardScopeClaims(token).create_response_dic())
+    if oidc_settings.get('OIDC_EXTRA_SCOPE_CLAIMS'):
+        claims.update(oidc_settings.get('OIDC_EXTRA_SCOPE_CLAIMS', import_str=True)(token).create_response_dic())
+    cache.set_userinfo(token, claims, generation)
+    return claims
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@protected_resource_view(['openid'])
+def userinfo(request, token):
+    """
+    A drop-in replacement for oidc_provider's userinfo endpoint that serves repeat requests from the cache
+
+    The token is always checked first, so a revoked or expired token is never served; the cache saves building the
+    claims, which is most of the work.
+    """
+    claims = cache.get_userinfo(token)
+    if claims is not None:
+        metrics.incr('oidc.userinfo.cache.hit')
+    else:
+        metrics.incr('oidc.userinfo.cache.miss')
+        claims = _build_userinfo(token)
+    return _userinfo_response(claims)
+
+
+@protected_resource_view(['openid'])
+def _exchange_access_token(request, token):
+    response = JsonResponse({
+        'access_token': access_tokens.issue(token, get_issuer(request=request)),
+        'token_type': 'bearer',
+        'expires_in': max(int(token.expires_at.timestamp() - time.time()), 0),
+        'scope': ' '.join(token.scope),
+    })
+    response['Cache-Control'] = 'no-store'
+    response['Pragma'] = 'no-cache'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def jwt_access_token(request):
+    """Exchanges the opaque access token presented for a self-contained JWT access token"""
+    if not access_tokens.enabled():
+        raise Http404
+    return _exchange_access_token(request)
+
+
+class CachedDocumentView(View):
+    """Serves a precomputed JSON document with an ETag, answering conditional requests with a 304"""
+    max_age_setting = None
+
+    def get_document(self, request):
+        """Returns a (content, etag) pair"""
+        raise NotImplementedError
+
+    def get(self, request):
+        content, etag = self.get_document(request)
+        response = get_conditional_response(request, etag=etag) or HttpResponse(content,
+                                                                                content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age={}'.format(getattr(settings, self.max_age_setting))
+        response['Access-Control-Allow-Origin'] = '*'
+        return response
+
+
+@functools.lru_cache(maxsize=16)
+def _provider_info(site_url):
+    # Mirrors oidc_provider.views.ProviderInfoView, which would otherwise reverse every URL on each request
+    info = collections.OrderedDict([
+        ('issuer', get_issuer(site_url=site_url)),
+        ('authorization_endpoint', site_url + reverse('oidc_provider:authorize')),
+        ('token_endpoint', site_url + reverse('oidc_provider:token')),
+        ('userinfo_endpoint', site_url + reverse('oidc_provider:userinfo')),
+        ('end_session_endpoint', site_url + reverse('oidc_provider:end-session')),
+        ('response_types_supported', [x[0] for x in RESPONSE_TYPE_CHOICES]),
+        ('jwks_uri', site_url + reverse('oidc_provider:jwks')),
+        ('id_token_signing_alg_values_supported', ['HS256', 'RS256']),
+        ('subject_types_supported', ['public']),
+        ('token_endpoint_auth_methods_supported', ['client_secret_post', 'client_secret_basic']),
+    ])
+    if oidc_settings.get('OIDC_SESSION_MANAGEMENT_ENABLE'):
+        info['check_session_iframe'] = site_url + reverse('oidc_provider:check-session-iframe')
+    content = json.dumps(info).encode()
+    return content, '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+
+class ProviderInfoView(CachedDocumentView):
+    max_age_setting = 'OIDC_DISCOVERY_MAX_AGE'
+
+    def get_document(self, request):
+        return _provider_info(get_site_url(request=request))
+
+
+class JwksView(CachedDocumentView):
+    max_age_setting = 'OIDC_JWKS_MAX_AGE'
+
+    def get_document(self, request):
+        key_set = keys.get_key_set()
+        return key_set.jwks, key_set.jwks_etag
@@ -15,7 +15,6 @@ from django.views.generic import TemplateView, DetailView
 from django.views.generic.detail import SingleObjectMixin
 from formtools.wizard.views import SessionWizardView, NamedUrlSessionWizardView, NamedUrlCookieWizardView
 from registration.backends.hmac.views import RegistrationView, REGISTRATION_SALT
-from social_django.models import Partial
 
 from idm_auth.auth_core_integration.utils import get_identity_data
 from idm_auth.forms import SetPasswordForm
@@ -33,10 +32,7 @@ class SocialPipelineMixin(View):
     @cached_property
     def social_partial(self):
         if 'partial_pipeline_token' in self.request.session:
-            try:
-                return Partial.objects.get(token=self.request.session['partial_pipeline_token'])
-            except Partial.DoesNotExist:  # pragma: nocover
-                return None
+            return models.CachedPartial.load(self.request.session['partial_pipeline_token'])
 
 
 class SignupView(SocialPipelineMixin, SessionWizardView):
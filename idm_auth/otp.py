@@ -0,0 +1,51 @@
+"""
+Request-scoped lookups of OTP devices
+
+The context processor, profile page, two-factor pipeline step and devices_for_user template filter all want a user's
+devices, often within the same request. These functions load each user's devices once per request (one query per
+device model) and answer everything else from that.
+"""
+
+import collections
+
+import django_otp
+
+from .request_cache import get_request_cache
+
+
+def _cache_key(user):
+    return ('otp-devices', user.pk)
+
+
+def prime_devices(users):
+    """Loads the devices for several users at once, e.g. for a page listing users"""
+    cache = get_request_cache()
+    users = [user for user in users if _cache_key(user) not in cache]
+    if not users:
+        return
+    devices = collections.defaultdict(list)
+    for model in django_otp.device_classes():
+        for device in model.objects.filter(user__in=users):
+            devices[device.user_id].append(device)
+    for user in users:
+        cache[_cache_key(user)] = devices[user.pk]
+
+
+def devices_for_user(user, confirmed=True):
+    """Like django_otp.devices_for_user, but shares its results for the rest of the request"""
+    if not user or user.is_anonymous:
+        return []
+    cache = get_request_cache()
+    if _cache_key(user) not in cache:
+        cache[_cache_key(user)] = [device
+                                   for model in django_otp.device_classes()
+                                   for device in model.objects.devices_for_user(user)]
+    return [device for device in cache[_cache_key(user)]
+            if confirmed is None or bool(device.confirmed) == bool(confirmed)]
+
+
+def default_device(user):
+    """Like two_factor.utils.default_device, but using the request-scoped device list"""
+    for device in devices_for_user(user):
+        if device.name == 'default':
+            return device
@@ -0,0 +1,29 @@
+import hashlib
+
+import zxcvbn_password.validators
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext_lazy as _
+
+from .request_cache import memoize
+
+
+def zxcvbn(password, user_inputs=()):
+    """
+    Returns the zxcvbn analysis of a password, computed at most once per request for each password and set of user
+    inputs.
+    """
+    user_inputs = tuple(str(user_input) for user_input in user_inputs if user_input)
+    key = ('zxcvbn', hashlib.sha256(password.encode()).hexdigest(), user_inputs)
+    return memoize(key, zxcvbn_password.validators.zxcvbn, password, user_inputs=list(user_inputs))
+
+
+class ZXCVBNValidator(zxcvbn_password.validators.ZXCVBNValidator):
+    """A drop-in replacement for zxcvbn_password.ZXCVBNValidator that shares its analysis within a request"""
+
+    def validate(self, password, user=None):
+        user_inputs = [getattr(user, attribute) for attribute in self.user_attributes
+                       if user is not None and hasattr(user, attribute)]
+        results = zxcvbn(password, user_inputs)
+        if results.get('score', 0) < self.min_score:
+            feedback = ', '.join(results.get('feedback', {}).get('suggestions', []))
+            raise ValidationError(_(feedback), code=self.code, params={})
@@ -4,7 +4,8 @@ from django.contrib.auth import get_user_model
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from social_core.pipeline.partial import partial
-from two_factor.utils import default_device
+
+from idm_auth.otp import default_device
 
 
 def add_user_id(user=None, **kwargs):
@@ -0,0 +1,22 @@
+import time
+
+from django.db import transaction
+
+
+def delete_in_batches(queryset, batch_size=1000):
+    """
+    Deletes everything matched by a queryset, a batch at a time, each in its own transaction.
+
+    This keeps each DELETE (and the locks it takes) short, so that it doesn't hold up other users of the table. Returns
+    the number of rows deleted and the time taken, in seconds.
+    """
+    model, deleted, start = queryset.model, 0, time.time()
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted += model._base_manager.filter(pk__in=pks).delete()[0]
+        if len(pks) < batch_size:
+            break
+    return deleted, time.time() - start
@@ -0,0 +1,36 @@
+"""
+Storage for values that should be computed at most once per request
+
+RequestCacheMiddleware gives each request a fresh cache, which is thrown away when the response is returned. Outside a
+request (e.g. in Celery tasks and management commands) nothing is remembered.
+"""
+
+import threading
+
+_local = threading.local()
+
+
+def get_request_cache():
+    cache = getattr(_local, 'cache', None)
+    return cache if cache is not None else {}
+
+
+def memoize(key, func, *args, **kwargs):
+    cache = get_request_cache()
+    try:
+        return cache[key]
+    except KeyError:
+        cache[key] = value = func(*args, **kwargs)
+        return value
+
+
+class RequestCacheMiddleware(object):
+    def process_request(self, request):
+        _local.cache = {}
+
+    def process_response(self, request, response):
+        _local.cache = None
+        return response
+
+    def process_exception(self, request, exception):
+        _local.cache = None
@@ -1,22 +1,75 @@
 from django.conf import settings
+from django.db.models import Manager, QuerySet
+from django.utils.functional import cached_property
 from rest_framework import serializers
 
 from . import models
 
 
-class TypeMixin(serializers.Serializer):
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data['@type'] = self.Meta.model.__name__
-        return data
+class SparseFieldsMixin(serializers.Serializer):
+    """Restricts the fields serialized to those named in a comma-separated `fields` query parameter, if given"""
+    @cached_property
+    def wanted_fields(self):
+        request = self.context.get('request')
+        fields = getattr(request, 'query_params', {}).get('fields')
+        return set(fields.split(',')) if fields else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.wanted_fields is not None:
+            for name in set(fields) - self.wanted_fields:
+                fields.pop(name)
+        return fields
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Querysets are read with values(), so that no model instances are created
+        if isinstance(data, Manager):
+            data = data.all()
+        if isinstance(data, QuerySet):
+            data = data.values(*self.child.columns)
+        return [self.child.to_representation(item) for item in data]
+
 
+class UserSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
+    """
+    Serializes users for the API and broker notifications
 
-class UserSerializer(TypeMixin, serializers.HyperlinkedModelSerializer):
+    Representations are built from a layout of plain functions worked out once per serializer, rather than by the
+    serializer fields, which DRF would otherwise construct for every notification and call for every value. Model
+    instances, querysets and the dicts returned by `values(*UserSerializer.columns)` are all accepted.
+    `manage.py benchmark_user_serializer` compares this with DRF's own serialization.
+    """
     principal_name = serializers.SerializerMethodField()
 
+    # The model fields the representation is made from
+    columns = ('id', 'username', 'primary', 'identity_id')
+
     def get_principal_name(self, instance):
         return '{}@{}'.format(instance.username, settings.DEFAULT_REALM) if instance.username else None
 
+    @cached_property
+    def layout(self):
+        realm_suffix = '@' + settings.DEFAULT_REALM
+        formatters = {
+            'id': lambda row: str(row['id']),
+            'username': lambda row: row['username'],
+            'primary': lambda row: bool(row['primary']),
+            'identity_id': lambda row: str(row['identity_id']) if row['identity_id'] is not None else None,
+            'principal_name': lambda row: row['username'] + realm_suffix if row['username'] else None,
+        }
+        return tuple((name, formatters[name]) for name in self.Meta.fields
+                     if self.wanted_fields is None or name in self.wanted_fields)
+
+    def to_representation(self, instance):
+        if not isinstance(instance, dict):
+            instance = {column: getattr(instance, column) for column in self.columns}
+        data = {name: format(instance) for name, format in self.layout}
+        data['@type'] = self.Meta.model.__name__
+        return data
+
     class Meta:
         model = models.User
-        fields = ('id', 'username', 'primary', 'identity_id', 'principal_name')
\ No newline at end of file
+        fields = ('id', 'username', 'primary', 'identity_id', 'principal_name')
+        list_serializer_class = UserListSerializer
@@ -0,0 +1,106 @@
+"""
+A session engine that indexes sessions by user
+
+Set SESSION_ENGINE to 'idm_auth.session_backend' to use it. Sessions are stored in idm_auth.models.UserSession.
+"""
+
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.db.models import Count
+from django.utils import timezone
+
+from idm_auth import metrics
+from idm_auth.purge import delete_in_batches
+
+
+class SessionStore(DBStore):
+    @classmethod
+    def get_model_class(cls):
+        from idm_auth.models import UserSession
+        return UserSession
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        try:
+            obj.user_id = uuid.UUID(data[SESSION_KEY])
+        except (KeyError, ValueError):
+            obj.user_id = None
+        return obj
+
+    @classmethod
+    def clear_expired(cls, batch_size=1000):
+        deleted, duration = delete_in_batches(
+            cls.get_model_class().objects.filter(expire_date__lt=timezone.now()).order_by('expire_date'), batch_size)
+        metrics.incr('sessions.expired', deleted)
+        return deleted, duration
+
+
+def enabled():
+    return settings.SESSION_ENGINE == __name__
+
+
+def get_user_sessions(user):
+    from idm_auth.models import UserSession
+    return UserSession.objects.filter(user=user, expire_date__gt=timezone.now())
+
+
+def revoke_user_sessions(users, except_session_key=None):
+    """
+    Deletes all the sessions belonging to one or more users, optionally keeping the current one. Returns the number
+    of sessions revoked.
+    """
+    from idm_auth.models import UserSession
+    if not isinstance(users, (list, tuple, set)):
+        users = [users]
+    queryset = UserSession.objects.filter(user__in=users)
+    if except_session_key:
+        queryset = queryset.exclude(session_key=except_session_key)
+    revoked = queryset.delete()[0]
+    metrics.incr('sessions.revoked', revoked)
+    return revoked
+
+
+def user_saved(instance, created, **kwargs):
+    """
+    Signal receiver that revokes a user's sessions once a password change has been saved
+
+    Every way of changing a password (the password change and reset forms, activation, and the kvno bump for
+    Kerberos-backed passwords) goes through User.set_password(), which marks the user. The request that made the
+    change keeps its session if it calls update_session_auth_hash(), which moves the session to a new key.
+    """
+    if getattr(instance, '_password_changed', False):
+        instance._password_changed = False
+        if not created:
+            revoke_user_sessions(instance)
+
+
+def count_sessions(authenticated=None):
+    from idm_auth.models import UserSession
+    queryset = UserSession.objects.filter(expire_date__gt=timezone.now())
+    if authenticated is not None:
+        queryset = queryset.filter(user__isnull=not authenticated)
+    return queryset.count()
+
+
+_session_counts = None, {}
+
+
+def get_session_counts():
+    """
+    Returns the numbers of active and authenticated sessions, for the sessions.* gauges
+
+    Counting scans every unexpired session, so it's done in one query at most every SESSION_COUNT_INTERVAL seconds
+    (default 300), rather than every time a metrics snapshot is taken.
+    """
+    global _session_counts
+    counted_at, counts = _session_counts
+    if counted_at is None or time.time() - counted_at >= getattr(settings, 'SESSION_COUNT_INTERVAL', 300):
+        from idm_auth.models import UserSession
+        counts = UserSession.objects.filter(expire_date__gt=timezone.now()) \
+            .aggregate(active=Count('pk'), authenticated=Count('user'))
+        _session_counts = time.time(), counts
+    return counts
@@ -71,6 +71,7 @@ else:
 SITE_ID = 1
 
 MIDDLEWARE_CLASSES = [
+    'idm_auth.request_cache.RequestCacheMiddleware',
     'django.middleware.common.CommonMiddleware',
     'reversion.middleware.RevisionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -135,6 +136,13 @@ LOGIN_REDIRECT_URL = '/account/profile/'
 LOGIN_URL = 'login'
 LOGOUT_URL = 'logout'
 
+# Partial pipelines are kept in the cache (see idm_auth.models.CachedPartial)
+SOCIAL_AUTH_STORAGE = 'idm_auth.social_storage.IDMAuthStorage'
+SOCIAL_AUTH_PARTIAL_TTL = 3600
+SOCIAL_AUTH_PARTIAL_DURABLE = True
+# Keys to drop from the stored backend response, where later pipeline steps don't need them
+SOCIAL_AUTH_PARTIAL_DISCARD_RESPONSE_KEYS = ()
+
 SOCIAL_AUTH_PIPELINE = (
     # Get the information we can about the user and return it in a simple
     # format to create the user instance later. On some cases the details are
@@ -191,8 +199,68 @@ BROKER_PREFIX = os.environ.get('BROKER_PREFIX', 'idm.auth.')
 
 
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-partials': {
+        'task': 'idm_auth.tasks.partials.purge_expired_partials',
+        'schedule': 3600,
+    },
+    'clear-expired-sessions': {
+        'task': 'idm_auth.tasks.sessions.clear_expired_sessions',
+        'schedule': 3600,
+    },
+    'purge-user-tombstones': {
+        'task': 'idm_auth.tasks.users.purge_user_tombstones',
+        'schedule': 86400,
+    },
+    'purge-expired-oidc-grants': {
+        'task': 'idm_auth.tasks.oidc.purge_expired_oidc_grants',
+        'schedule': 3600,
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    },
+}
+# Whether every process (web workers and Celery) sees the same default cache, e.g. memcached or Redis. State that
+# other processes must see the same way (partial pipelines, userinfo responses) is only kept in the cache if so.
+CACHE_SHARED = CACHES['default']['BACKEND'] not in ('django.core.cache.backends.locmem.LocMemCache',
+                                                    'django.core.cache.backends.dummy.DummyCache')
 
 OIDC_EXTRA_SCOPE_CLAIMS = 'idm_auth.oidc.claims.IDMAuthScopeClaims'
+# Seconds for which a rendered userinfo response may be reused; 0 disables the cache, as does CACHE_SHARED being false
+OIDC_USERINFO_CACHE_TIMEOUT = 60
+# Cache-Control max-age for the discovery document and JWKS; the latter is kept short so key rotation is noticed
+OIDC_DISCOVERY_MAX_AGE = 3600
+OIDC_JWKS_MAX_AGE = 300
+# Seconds between each process's checks for RSA keys added or removed by another process
+OIDC_KEYS_REFRESH = 5
+# Allow opaque access tokens to be exchanged for JWTs that resource servers can validate locally
+OIDC_JWT_ACCESS_TOKENS = bool(os.environ.get('OIDC_JWT_ACCESS_TOKENS'))
+OIDC_JWT_REVOCATION_REFRESH = 5
+# Seconds after their access token expires that tokens (and so their refresh tokens) are purged
+OIDC_TOKEN_PURGE_AFTER = 30 * 86400
+
+# Connection pooling for ProxiedAPIView; connections to each upstream host are kept alive and shared between requests
+PROXIED_API_POOL_CONNECTIONS = 4
+PROXIED_API_POOL_MAXSIZE = 10
+PROXIED_API_POOL_BLOCK = False
+# Bytes of proxied GET responses to keep per process (0 disables the cache), and the largest response worth keeping
+PROXIED_API_CACHE_SIZE = int(os.environ.get('PROXIED_API_CACHE_SIZE', 0))
+PROXIED_API_CACHE_MAX_ENTRY_SIZE = 1024 * 1024
+# Simultaneous upstream connections per proxied API under idm_auth.asgi
+PROXIED_API_ASYNC_CONNECTIONS = 100
+# Upstream access tokens are refreshed when they have less than this many seconds left
+SOCIAL_AUTH_REFRESH_MARGIN = 300
+# Seconds to wait after a failed refresh before trying again, using the old access token meanwhile
+SOCIAL_AUTH_REFRESH_RETRY = 60
+
+# The most keys accepted by a single POST to /api/user/lookup/
+USER_LOOKUP_MAX_KEYS = 5000
+# The user change feed remembers deletions for this many seconds
+USER_TOMBSTONE_RETENTION = 90 * 86400
 
 IDM_CORE_URL = os.environ.get('IDM_CORE_URL', 'http://localhost:8000/')
 IDM_CORE_API_URL = os.environ.get('IDM_CORE_API_URL', 'http://localhost:8000/api/')
@@ -222,6 +290,8 @@ def _get_inactive_user_url():
 SOCIAL_AUTH_INACTIVE_USER_URL = lazy(_get_inactive_user_url, six.text_type)()
 
 SESSION_COOKIE_NAME = 'idm-auth-sessionid'
+# Indexes sessions by user, so they can be revoked together
+SESSION_ENGINE = 'idm_auth.session_backend'
 
 # django-registration
 ACCOUNT_ACTIVATION_DAYS = 7
@@ -253,6 +323,18 @@ DEFAULT_REALM = os.environ.get('DEFAULT_REALM', 'EXAMPLE.COM')
 KADMIN_PRINCIPAL_NAME = os.environ.get('KADMIN_PRINCIPAL_NAME')
 CLIENT_PRINCIPAL_NAME = os.environ.get('CLIENT_PRINCIPAL_NAME')
 
+# If set, each worker process acquires a TGT for CLIENT_PRINCIPAL_NAME from this keytab when it starts, and keeps it
+# fresh in the background. kadmin uses it too if KADMIN_PRINCIPAL_NAME is unset or the same principal.
+KERBEROS_CLIENT_KEYTAB = os.environ.get('KERBEROS_CLIENT_KEYTAB')
+KERBEROS_TGT_LIFETIME = int(os.environ.get('KERBEROS_TGT_LIFETIME', 36000))
+KERBEROS_TGT_RENEW_MARGIN = int(os.environ.get('KERBEROS_TGT_RENEW_MARGIN', 3600))
+
+# Where principals are administered and passwords checked. idm_auth.kerberos.kdc.InMemoryKDC is a stand-in for tests
+# and benchmarks, and takes a 'latency' option.
+KERBEROS_KDC = {
+    'BACKEND': os.environ.get('KERBEROS_KDC_BACKEND', 'idm_auth.kerberos.kdc.KadminKDC'),
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [{
     'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -266,7 +348,7 @@ AUTH_PASSWORD_VALIDATORS = [{
 }, {
     'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
 }, {
-    'NAME': 'zxcvbn_password.ZXCVBNValidator',
+    'NAME': 'idm_auth.password_validation.ZXCVBNValidator',
     'OPTIONS': {
         'min_score': 3,
         'user_attributes': ('username', 'email', 'first_name', 'last_name')
@@ -4,7 +4,8 @@ from social_core.backends.oauth import BaseOAuth2
 class ORCIDSandboxAuth(BaseOAuth2):
     """ORCID sandbox OAuth authentication backend"""
     name = 'orcid'
-    #EXTRA_DATA = [('id', 'id')]
+    # Kept so that idm_auth.social_credentials can refresh the access token before it expires
+    EXTRA_DATA = [('refresh_token', 'refresh_token', True), ('expires_in', 'expires')]
     REQUEST_TOKEN_METHOD = 'POST'
     ACCESS_TOKEN_METHOD = 'POST'
     ID_KEY = 'orcid'
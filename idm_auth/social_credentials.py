@@ -0,0 +1,106 @@
+"""
+Cached access to the upstream credentials held in UserSocialAuth.extra_data
+
+ProxiedAPIView needs a user's credentials for a provider on every call. They're cached for as long as the OIDC token
+the call was made with, and refreshed shortly before the upstream access token expires rather than after a failed
+upstream request. Only one process refreshes a given user's credentials at a time. Credentials without a refresh
+token are used as they are, and after a failed refresh no other is tried for SOCIAL_AUTH_REFRESH_RETRY seconds.
+
+Saving a UserSocialAuth invalidates its cached credentials, which only reaches other processes if CACHE_SHARED says
+they share the cache. Otherwise credentials aren't cached, and refreshes are serialized by locking the
+UserSocialAuth row instead.
+"""
+
+import contextlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from social_django.models import UserSocialAuth
+from social_django.utils import load_strategy
+
+from idm_auth import metrics
+from idm_auth.locks import cache_lock
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(provider, user_id):
+    return 'social-credentials:{}:{}'.format(provider, user_id)
+
+
+def _refresh_failed_key(provider, user_id):
+    return 'social-credentials-refresh-failed:{}:{}'.format(provider, user_id)
+
+
+def _needs_refresh(extra_data):
+    if not extra_data.get('refresh_token'):
+        return False
+    remaining = UserSocialAuth(extra_data=extra_data).expiration_timedelta()
+    return remaining is not None and \
+        remaining.total_seconds() < getattr(settings, 'SOCIAL_AUTH_REFRESH_MARGIN', 300)
+
+
+def _cache_enabled():
+    return getattr(settings, 'CACHE_SHARED', False)
+
+
+def get_credentials(provider, user_id, timeout):
+    """
+    Returns the extra_data for a user's social auth with a provider, caching it for `timeout` seconds
+
+    Raises UserSocialAuth.DoesNotExist if the user hasn't associated an account with the provider.
+    """
+    extra_data = cache.get(_cache_key(provider, user_id)) if _cache_enabled() else None
+    if extra_data is None:
+        metrics.incr('social_credentials.cache.miss')
+        extra_data = UserSocialAuth.objects.filter(provider=provider, user_id=user_id) \
+            .values_list('extra_data', flat=True).get()
+        if _cache_enabled():
+            cache.set(_cache_key(provider, user_id), extra_data, timeout)
+    else:
+        metrics.incr('social_credentials.cache.hit')
+    # Without a shared cache this only holds off retries in this process, which is as much as it needs to
+    if _needs_refresh(extra_data) and not cache.get(_refresh_failed_key(provider, user_id)):
+        extra_data = refresh_credentials(provider, user_id, timeout)
+    return extra_data
+
+
+@contextlib.contextmanager
+def _locked_social_auth(provider, user_id):
+    if _cache_enabled():
+        with cache_lock('social-credentials-refresh:{}:{}'.format(provider, user_id), timeout=30):
+            yield UserSocialAuth.objects.get(provider=provider, user_id=user_id)
+    else:
+        with transaction.atomic():
+            yield UserSocialAuth.objects.select_for_update().get(provider=provider, user_id=user_id)
+
+
+def refresh_credentials(provider, user_id, timeout):
+    with _locked_social_auth(provider, user_id) as usa:
+        extra_data = usa.extra_data
+        # Someone else may have refreshed them while we waited for the lock
+        if _needs_refresh(extra_data):
+            backend = usa.get_backend_instance(load_strategy())
+            try:
+                response = backend.refresh_token(extra_data['refresh_token'])
+            except Exception:
+                metrics.incr('social_credentials.refresh.failed')
+                logger.exception("Couldn't refresh %s credentials for user %s", provider, user_id)
+                cache.set(_refresh_failed_key(provider, user_id), True,
+                          getattr(settings, 'SOCIAL_AUTH_REFRESH_RETRY', 60))
+            else:
+                refreshed = backend.extra_data(usa.user, usa.uid, response, {})
+                extra_data = dict(extra_data, **{k: v for k, v in refreshed.items() if v is not None})
+                # A single UPDATE, which also skips the post_save handlers that resync the user's social accounts
+                UserSocialAuth.objects.filter(pk=usa.pk).update(extra_data=extra_data)
+                metrics.incr('social_credentials.refresh.succeeded')
+        if _cache_enabled():
+            cache.set(_cache_key(provider, user_id), extra_data, timeout)
+        return extra_data
+
+
+def invalidate(provider, user_id):
+    if _cache_enabled():
+        cache.delete(_cache_key(provider, user_id))
@@ -0,0 +1,7 @@
+from social_django.models import DjangoStorage
+
+from .models import CachedPartial
+
+
+class IDMAuthStorage(DjangoStorage):
+    partial = CachedPartial
@@ -1 +1,5 @@
-from .social_accounts import *
\ No newline at end of file
+from .oidc import *
+from .partials import *
+from .sessions import *
+from .social_accounts import *
+from .users import *
@@ -0,0 +1,25 @@
+import datetime
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from idm_auth.purge import delete_in_batches
+
+__all__ = ['purge_expired_oidc_grants']
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def purge_expired_oidc_grants(batch_size=1000):
+    from oidc_provider.models import Code, Token
+    now = timezone.now()
+    deleted, duration = delete_in_batches(Code.objects.filter(expires_at__lt=now).order_by('expires_at'), batch_size)
+    logger.info("Purged %d expired OIDC authorization codes in %.2fs", deleted, duration)
+    # A token's refresh token outlives its access token, so only purge tokens that are unlikely to be refreshed
+    cutoff = now - datetime.timedelta(seconds=getattr(settings, 'OIDC_TOKEN_PURGE_AFTER', 30 * 86400))
+    deleted, duration = delete_in_batches(Token.objects.filter(expires_at__lt=cutoff).order_by('expires_at'),
+                                          batch_size)
+    logger.info("Purged %d expired OIDC tokens in %.2fs", deleted, duration)
@@ -0,0 +1,21 @@
+import datetime
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from idm_auth.purge import delete_in_batches
+
+__all__ = ['purge_expired_partials']
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def purge_expired_partials(batch_size=1000):
+    from idm_auth.models import CachedPartial
+    cutoff = timezone.now() - datetime.timedelta(seconds=CachedPartial.get_ttl())
+    deleted, duration = delete_in_batches(CachedPartial.objects.filter(timestamp__lt=cutoff).order_by('timestamp'),
+                                          batch_size)
+    logger.info("Purged %d expired partial pipelines in %.2fs", deleted, duration)
@@ -0,0 +1,16 @@
+import logging
+
+from celery import shared_task
+
+__all__ = ['clear_expired_sessions']
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def clear_expired_sessions(batch_size=1000):
+    from idm_auth import session_backend
+    if not session_backend.enabled():
+        return
+    deleted, duration = session_backend.SessionStore.clear_expired(batch_size)
+    logger.info("Cleared %d expired sessions in %.2fs", deleted, duration)
@@ -28,9 +28,9 @@ def sync_social_accounts(user_pk):
     if not user.primary:
         return
 
-    user_social_auths = UserSocialAuth.objects.filter(user=user)
-    by_upstream_id = {str(usa.pk): usa
-                      for usa in user_social_auths}
+    user_social_auths = BackendMeta.wrap_all(UserSocialAuth.objects.filter(user=user))
+    by_upstream_id = {str(backend_meta.id): backend_meta
+                      for backend_meta in user_social_auths}
     online_account_url = urljoin(settings.IDM_CORE_API_URL, 'online-account/')
 
     results, url = [], online_account_url
@@ -44,17 +44,15 @@ def sync_social_accounts(user_pk):
         url = response_data.get('next')
 
     for result in results:
-        usa = by_upstream_id.get(result['upstream_id'])
-        if usa:
-            backend_meta = BackendMeta.wrap(usa)
+        backend_meta = by_upstream_id.get(result['upstream_id'])
+        if backend_meta:
             if backend_meta.username != result['screen_name']:
                 session.patch(result['url'], json={'screen_name': backend_meta.username}).raise_for_status()
             del by_upstream_id[result['upstream_id']]
         else:
             session.delete(result['url']).raise_for_status()
 
-    for upstream_id, usa in by_upstream_id.items():
-        backend_meta = BackendMeta.wrap(usa)
+    for upstream_id, backend_meta in by_upstream_id.items():
         provider_id = provider_id_override.get(backend_meta.provider, backend_meta.provider)
         if provider_id is None:
             continue
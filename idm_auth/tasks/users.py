@@ -0,0 +1,22 @@
+import datetime
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from idm_auth.purge import delete_in_batches
+
+__all__ = ['purge_user_tombstones']
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def purge_user_tombstones(batch_size=1000):
+    from idm_auth.models import UserTombstone
+    cutoff = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'USER_TOMBSTONE_RETENTION', 90 * 86400))
+    deleted, duration = delete_in_batches(UserTombstone.objects.filter(changed_at__lt=cutoff)
+                                          .order_by('change_xid', 'change_seq'),
+                                          batch_size)
+    logger.info("Purged %d user tombstones in %.2fs", deleted, duration)
@@ -75,8 +75,15 @@ AUTHENTICATION_BACKENDS += (
 
 PASSWORD_HASHERS.remove('idm_auth.kerberos.hashers.KerberosHasher')
 
+KERBEROS_KDC = {
+    'BACKEND': 'idm_auth.kerberos.kdc.InMemoryKDC',
+}
+
 ONBOARDING = {
     'REGISTRATION_OPEN': True,
     'REGISTRATION_OPEN_SOCIAL': True,
     'REGISTRATION_OPEN_SAML': True,
 }
+
+# Tests run in a single process, so the local-memory cache is as good as shared
+CACHE_SHARED = True
@@ -36,4 +36,4 @@ class DummyBackendMeta(BackendMeta):
     name = 'Dummy'
     font_icon = 'fa fa-exclamation-triangle'
 
-BackendMeta.registry[DummyBackendMeta.backend_id] = DummyBackendMeta()
\ No newline at end of file
+BackendMeta.register(DummyBackendMeta)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import json
+import threading
+import unittest.mock
+import uuid
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from idm_auth.models import User
+from idm_auth.serializers import UserSerializer
+from idm_auth.tests.utils import patch_identity_sync, update_user_from_identity_noop
+
+
+class UserAPITestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        self.users = [User.objects.create(identity_id=uuid.uuid4(), username='user{}'.format(i), primary=True)
+                      for i in range(5)]
+
+    def testCursorPagination(self):
+        seen, url = [], '/api/user/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()['results']), 2)
+            seen.extend(user['id'] for user in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(seen, sorted(str(user.id) for user in self.users))
+
+    def testSparseFields(self):
+        response = self.client.get('/api/user/?fields=id,username')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'username', '@type'})
+
+    def testFilters(self):
+        response = self.client.get('/api/user/', {'identity_id': str(self.users[1].identity_id)})
+        self.assertEqual([user['id'] for user in response.json()['results']], [str(self.users[1].id)])
+        response = self.client.get('/api/user/', {'username': 'user3'})
+        self.assertEqual([user['id'] for user in response.json()['results']], [str(self.users[3].id)])
+        self.assertEqual(self.client.get('/api/user/', {'identity_id': 'nonsense'}).status_code, 400)
+
+    def testConditionalGet(self):
+        response = self.client.get('/api/user/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/user/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        User.objects.filter(pk=self.users[0].pk).update(username='renamed')
+        self.assertEqual(self.client.get('/api/user/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class UserSerializerTestCase(TestCase):
+    def testRepresentations(self):
+        # bulk_create() skips the pre_save handler that would create an identity for a user without one
+        user, = User.objects.bulk_create([User(identity_id=None, username='alice', primary=False)])
+        expected = {'id': str(user.id), 'username': 'alice', 'primary': False, 'identity_id': None,
+                    'principal_name': 'alice@EXAMPLE.COM', '@type': 'User'}
+        self.assertEqual(UserSerializer(user).data, expected)
+        with self.assertNumQueries(1):
+            self.assertEqual(UserSerializer(User.objects.all(), many=True).data, [expected])
+        row = User.objects.values(*UserSerializer.columns).get()
+        self.assertEqual(UserSerializer(row).data, expected)
+
+
+class UserLookupTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        self.identity_id = uuid.uuid4()
+        self.primary = User.objects.create(identity_id=self.identity_id, username='alice', primary=True)
+        self.secondary = User.objects.create(identity_id=self.identity_id, username='alice-admin', primary=False)
+
+    def lookup(self, body):
+        return self.client.post('/api/user/lookup/', json.dumps(body), content_type='application/json')
+
+    def testMixedKeys(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.lookup({
+                'id': [str(self.primary.id), str(uuid.uuid4())],
+                'identity_id': [str(self.identity_id)],
+                'username': ['alice', 'bob'],
+                'principal_name': ['alice-admin@EXAMPLE.COM', 'alice@ELSEWHERE.ORG'],
+            })
+        # RevisionMiddleware wraps POSTs in a transaction, which adds savepoint queries
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 1)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(list(data['id']), [str(self.primary.id)])
+        self.assertEqual(sorted(user['username'] for user in data['identity_id'][str(self.identity_id)]),
+                         ['alice', 'alice-admin'])
+        self.assertEqual(data['username'], {'alice': {'id': str(self.primary.id),
+                                                      'username': 'alice',
+                                                      'identity_id': str(self.identity_id),
+                                                      'primary': True,
+                                                      'principal_name': 'alice@EXAMPLE.COM'}})
+        self.assertEqual(data['principal_name']['alice-admin@EXAMPLE.COM']['id'], str(self.secondary.id))
+        self.assertNotIn('alice@ELSEWHERE.ORG', data['principal_name'])
+
+    def testKeyedAsSent(self):
+        upper, unhyphenated = str(self.primary.id).upper(), self.identity_id.hex
+        data = self.lookup({'id': [upper, str(self.primary.id)], 'identity_id': [unhyphenated]}).json()
+        self.assertEqual(sorted(data['id']), sorted([upper, str(self.primary.id)]))
+        self.assertEqual(len(data['identity_id'][unhyphenated]), 2)
+
+    def testInvalid(self):
+        self.assertEqual(self.lookup({'identity_id': ['nonsense']}).status_code, 400)
+        self.assertEqual(self.lookup({'email': ['alice@example.org']}).status_code, 400)
+        self.assertEqual(self.lookup({'username': 'alice'}).status_code, 400)
+
+    @override_settings(USER_LOOKUP_MAX_KEYS=2)
+    def testTooManyKeys(self):
+        self.assertEqual(self.lookup({'username': ['a', 'b'], 'principal_name': ['c@EXAMPLE.COM']}).status_code, 400)
+
+
+# Changes only appear once their transaction has committed, so these can't run inside a test transaction
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class UserChangeFeedTestCase(TransactionTestCase):
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        data = self.client.get('/api/user/changes/', params).json()
+        return data['cursor'], [(change['type'], change['user']['id']) for change in data['results']]
+
+    def testFeed(self):
+        cursor, _ = self.changes()
+        alice = User.objects.create(identity_id=uuid.uuid4(), username='alice', primary=True)
+        bob = User.objects.create(identity_id=uuid.uuid4(), username='bob', primary=True)
+        cursor, changes = self.changes(cursor)
+        self.assertEqual(changes, [('created', str(alice.id)), ('created', str(bob.id))])
+
+        User.objects.filter(pk=alice.pk).update(username='alice2')
+        # Logging in isn't a change
+        User.objects.filter(pk=bob.pk).update(last_login=timezone.now())
+        bob_id = str(bob.id)
+        bob.delete()
+        cursor, changes = self.changes(cursor)
+        self.assertEqual(changes, [('changed', str(alice.id)), ('deleted', bob_id)])
+        self.assertEqual(self.changes(cursor), (cursor, []))
+
+    def testPaging(self):
+        cursor, _ = self.changes()
+        users = [User.objects.create(identity_id=uuid.uuid4(), primary=True) for i in range(3)]
+        cursor, first = self.changes(cursor, page_size=2)
+        cursor, second = self.changes(cursor, page_size=2)
+        self.assertEqual([user_id for _, user_id in first + second], [str(user.id) for user in users])
+
+    def testInFlightTransactionHeldBack(self):
+        cursor, _ = self.changes()
+        alice_id = uuid.uuid4()
+        alice_created, commit_alice = threading.Event(), threading.Event()
+
+        def create_alice():
+            # On the thread's own connection, so its transaction stays open while the test's commits
+            try:
+                with transaction.atomic():
+                    User.objects.create(id=alice_id, identity_id=uuid.uuid4(), username='alice', primary=True)
+                    alice_created.set()
+                    commit_alice.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=create_alice)
+        thread.start()
+        try:
+            self.assertTrue(alice_created.wait(10))
+            bob = User.objects.create(identity_id=uuid.uuid4(), username='bob', primary=True)
+            # Bob's change has committed, but would end up behind the cursor if it were handed out before Alice's
+            self.assertEqual(self.changes(cursor), (cursor, []))
+        finally:
+            commit_alice.set()
+            thread.join()
+        self.assertEqual(self.changes(cursor)[1], [('created', str(alice_id)), ('created', str(bob.id))])
@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+import sys
+import unittest
+import unittest.mock
+import uuid
+
+from Cryptodome.PublicKey import RSA
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from oidc_provider.models import Client, RSAKey, Token
+
+from idm_auth.models import User
+from idm_auth.oidc import access_tokens
+from idm_auth.tests.utils import update_user_from_identity_noop
+
+
+# idm_auth.asgi uses async/await, so can't even be imported on older Pythons. The messages are passed as completed
+# futures rather than from coroutines, so that this module can still be collected there.
+@unittest.skipIf(sys.version_info < (3, 5), "The ASGI application needs Python 3.5 or later")
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class ASGITestCase(TransactionTestCase):
+    def call(self, path, headers=()):
+        from idm_auth import asgi
+
+        messages = []
+        loop = asyncio.new_event_loop()
+
+        def completed(result):
+            future = loop.create_future()
+            future.set_result(result)
+            return future
+
+        def receive():
+            return completed({'type': 'http.request', 'body': b'', 'more_body': False})
+
+        def send(message):
+            messages.append(message)
+            return completed(None)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': list(headers)}
+        try:
+            loop.run_until_complete(asgi.application(scope, receive, send))
+        finally:
+            loop.close()
+        return messages[0]['status']
+
+    def testUnknownPath(self):
+        self.assertEqual(self.call('/elsewhere/'), 404)
+
+    def testInvalidToken(self):
+        from idm_auth import asgi
+
+        proxied_api = asgi.AsyncProxiedAPI('https://api.example.org/', 'orcid', 'orcid')
+        with unittest.mock.patch.dict(asgi.proxied_apis, {'/proxied-api/orcid/': proxied_api}):
+            self.assertEqual(self.call('/proxied-api/orcid/works', [(b'authorization', b'Bearer nonsense')]), 401)
+
+    @override_settings(OIDC_JWT_ACCESS_TOKENS=True)
+    def testJWTAccessTokenAccepted(self):
+        from idm_auth import asgi
+
+        cache.clear()
+        RSAKey.objects.create(key=RSA.generate(1024).exportKey('PEM').decode())
+        user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        token = Token(user=user, client=Client.objects.create(name='Test', client_id='test', response_type='code'),
+                      access_token='access', refresh_token='refresh',
+                      expires_at=timezone.now() + datetime.timedelta(hours=1))
+        token.scope, token.id_token = ['openid'], {'sub': str(user.identity_id)}
+        token.save()
+        jwt = access_tokens.issue(token, 'http://testserver/openid')
+
+        proxied_api = asgi.AsyncProxiedAPI('https://api.example.org/', 'orcid', 'orcid')
+        with unittest.mock.patch.dict(asgi.proxied_apis, {'/proxied-api/orcid/': proxied_api}):
+            headers = [(b'host', b'testserver'), (b'authorization', 'Bearer {}'.format(jwt).encode())]
+            # Accepted, but the user hasn't linked an ORCID account
+            self.assertEqual(self.call('/proxied-api/orcid/works', headers), 403)
+            headers[0] = (b'host', b'testserver.local')
+            self.assertEqual(self.call('/proxied-api/orcid/works', headers), 401)
@@ -53,3 +53,46 @@ class AuthenticationFormTestCase(TestCase):
     def testEmpty(self):
         form = AuthenticationForm(data={'username': '', 'password': 'password'})
         self.assertFalse(form.is_valid())
+
+    def testUsernameCaseInsensitive(self):
+        user = User(identity_id=uuid.uuid4(), primary=True, username='abcd0123')
+        user.set_password('password')
+        user.save()
+        form = AuthenticationForm(data={'username': 'ABCD0123', 'password': 'password'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(str(user.id), form.cleaned_data['username'])
+
+    def testUsernameQueryCount(self):
+        user = User(identity_id=uuid.uuid4(), primary=True, username='abcd0123')
+        user.set_password('password')
+        user.save()
+        UserEmail.objects.create(user=user, email='alice@example.org')
+        form = AuthenticationForm(data={'username': user.username, 'password': 'password'})
+        # One query to resolve the user, and the backend doesn't need to fetch them again
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+
+    def testEmailQueryCount(self):
+        user = User(identity_id=uuid.uuid4(), primary=True, username='abcd0123')
+        user.set_password('password')
+        user.save()
+        UserEmail.objects.create(user=user, email='alice@example.org')
+        form = AuthenticationForm(data={'username': 'Alice@Example.org', 'password': 'password'})
+        # Usernames and email addresses are looked up together
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(str(user.id), form.cleaned_data['username'])
+
+    def testUsernameBeatsOtherUsersEmail(self):
+        user = User(identity_id=uuid.uuid4(), primary=True, username='alice@example.org')
+        user.set_password('password')
+        user.save()
+        other = User(identity_id=uuid.uuid4(), primary=True, username='abcd0123')
+        other.set_password('other password')
+        other.save()
+        UserEmail.objects.create(user=other, email='alice@example.org')
+        form = AuthenticationForm(data={'username': 'ALICE@example.org', 'password': 'password'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(str(user.id), form.cleaned_data['username'])
+        form = AuthenticationForm(data={'username': 'alice@example.org', 'password': 'other password'})
+        self.assertFalse(form.is_valid())
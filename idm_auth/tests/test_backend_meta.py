@@ -0,0 +1,27 @@
+from django.test import TestCase
+from social_django.models import UserSocialAuth
+
+from idm_auth.backend_meta import BackendMeta
+from idm_auth.saml.models import IDP
+
+
+class BackendMetaTestCase(TestCase):
+    def testSocialBackendsOrderedWithoutSAML(self):
+        social_backends = BackendMeta.social_backends()
+        self.assertNotIn('saml', [bm.backend_id for bm in social_backends])
+        self.assertEqual([bm.name for bm in social_backends], sorted(bm.name for bm in social_backends))
+        self.assertIs(social_backends, BackendMeta.social_backends())
+
+    def testSAMLLabelsResolvedTogether(self):
+        for name in ('first', 'second'):
+            IDP.objects.create(name=name, label='{} IdP'.format(name.title()),
+                               entity_id='https://{}.example.org/'.format(name),
+                               url='https://{}.example.org/sso'.format(name),
+                               x509cert='')
+        user_social_auths = [UserSocialAuth(provider='saml', uid='first:alice'),
+                             UserSocialAuth(provider='saml', uid='second:alice'),
+                             UserSocialAuth(provider='github', uid='1234', extra_data={'login': 'alice'})]
+        with self.assertNumQueries(1):
+            wrapped = BackendMeta.wrap_all(user_social_auths)
+            self.assertEqual([bm.username for bm in wrapped],
+                             ['alice at First IdP', 'alice at Second IdP', 'alice'])
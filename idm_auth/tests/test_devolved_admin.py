@@ -0,0 +1,70 @@
+import unittest.mock
+import uuid
+
+from django.contrib.admin.sites import site
+from django.test import RequestFactory, TestCase
+
+from idm_auth.admin import ApproximateCountPaginator
+from idm_auth.models import User, UserEmail
+from idm_auth.tests.utils import patch_identity_sync, update_user_from_identity_noop
+from idm_auth.views import UserListView
+
+
+class UserListViewTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        self.users = sorted((User.objects.create(identity_id=uuid.uuid4(), username='user{}'.format(i), primary=True)
+                             for i in range(5)), key=lambda user: user.pk)
+
+    def get_context(self, **params):
+        view = UserListView(page_size=2, request=RequestFactory().get('/user/', params), kwargs={}, args=())
+        view.object_list = view.get_queryset()
+        return view.get_context_data()
+
+    def testKeysetPaging(self):
+        seen, context = [], self.get_context()
+        self.assertIsNone(context['previous_before'])
+        while True:
+            seen.extend(context['object_list'])
+            if not context['next_after']:
+                break
+            context = self.get_context(after=context['next_after'])
+        self.assertEqual(seen, self.users)
+
+        context = self.get_context(before=self.users[4].pk)
+        self.assertEqual(context['object_list'], self.users[2:4])
+        self.assertEqual(context['previous_before'], self.users[2].pk)
+        self.assertEqual(context['next_after'], self.users[3].pk)
+
+    def testHasSocialAuth(self):
+        self.users[0].social_auth.create(provider='orcid', uid='0000-0000')
+        context = self.get_context()
+        self.assertEqual([user.has_social_auth for user in context['object_list']],
+                         [True, False])
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class UserAdminSearchTestCase(TestCase):
+    def testSearchMatchesAdditionalEmails(self):
+        user = User.objects.create(identity_id=uuid.uuid4(), username='alice', primary=True)
+        User.objects.create(identity_id=uuid.uuid4(), username='bob', primary=True)
+        UserEmail.objects.create(user=user, email='alice.hacker@example.org')
+        model_admin = site._registry[User]
+        for term in ('ALI', 'hacker@example'):
+            queryset, use_distinct = model_admin.get_search_results(None, User.objects.all(), term)
+            self.assertEqual(list(queryset), [user])
+            self.assertFalse(use_distinct)
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class ApproximateCountPaginatorTestCase(TestCase):
+    def testOverestimateClamped(self):
+        users = [User.objects.create(identity_id=uuid.uuid4(), primary=True) for i in range(5)]
+        paginator = ApproximateCountPaginator(User.objects.order_by('pk'), 2)
+        with unittest.mock.patch('idm_auth.admin.connections') as connections, \
+                unittest.mock.patch.object(ApproximateCountPaginator, 'threshold', 10):
+            connections.__getitem__().cursor().__enter__().fetchone.return_value = (1000.0,)
+            self.assertEqual(paginator.num_pages, 500)
+            page = paginator.page(50)
+        self.assertEqual((page.number, paginator.count, paginator.num_pages), (3, 5, 3))
+        self.assertEqual(list(page.object_list), sorted(users, key=lambda user: user.pk)[4:])
@@ -0,0 +1,172 @@
+import io
+import os
+import subprocess
+import unittest.mock
+import uuid
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from idm_auth import metrics
+from idm_auth.kerberos import credentials
+from idm_auth.kerberos.kdc import KadminKDC, get_kdc
+from idm_auth.kerberos.management.commands import provision_kerberos_principals
+from idm_auth.models import User
+from idm_auth.tests.utils import update_user_from_identity_noop
+
+
+@override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHERS + ['idm_auth.kerberos.hashers.KerberosHasher'],
+                   KERBEROS_KDC={'BACKEND': 'idm_auth.kerberos.kdc.InMemoryKDC'})
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class KerberosHasherTestCase(TestCase):
+    def setUp(self):
+        get_kdc().reset()
+
+    def create_user(self, username='abcd0123', password='password'):
+        user = User(identity_id=uuid.uuid4(), primary=True, username=username)
+        user.set_password(password)
+        user.save()
+        return user
+
+    def testSetPassword(self):
+        user = self.create_user()
+        self.assertEqual(user.password, 'kerberos$2$abcd0123')
+        self.assertEqual(get_kdc().principals['abcd0123'].password, 'password')
+
+    def testCheckPassword(self):
+        user = self.create_user()
+        self.assertTrue(user.check_password('password'))
+        self.assertFalse(user.check_password('wrongpassword'))
+
+    def testPasswordChangeIncrementsKvno(self):
+        user = self.create_user()
+        user.set_password('another password')
+        self.assertEqual(user.password, 'kerberos$3$abcd0123')
+
+    def testRename(self):
+        user = self.create_user()
+        user.username = 'efgh4567'
+        user.save()
+        self.assertEqual(user.password, 'kerberos$2$efgh4567')
+        self.assertNotIn('abcd0123', get_kdc().principals)
+        self.assertTrue(user.check_password('password'))
+
+    def testDisabledPrincipal(self):
+        user = self.create_user()
+        get_kdc().principals['abcd0123'].disable()
+        self.assertFalse(user.has_usable_password())
+        self.assertFalse(user.check_password('password'))
+
+    def testNoUsername(self):
+        user = User(identity_id=uuid.uuid4(), primary=True)
+        user.set_password('password')
+        self.assertFalse(user.password.startswith('kerberos$'))
+
+
+@override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHERS + ['idm_auth.kerberos.hashers.KerberosHasher'],
+                   KERBEROS_KDC={'BACKEND': 'idm_auth.kerberos.kdc.InMemoryKDC'})
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class ProvisionKerberosPrincipalsTestCase(TestCase):
+    def setUp(self):
+        get_kdc().reset()
+
+    def provision(self, *args):
+        call_command('provision_kerberos_principals', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def testDryRun(self):
+        user = User.objects.create(identity_id=uuid.uuid4(), primary=True, username='abcd0123', password='!')
+        self.provision('--dry-run')
+        self.assertNotIn('abcd0123', get_kdc().principals)
+        user.refresh_from_db()
+        self.assertEqual(user.password, '!')
+
+    def testResumeAfterUnrecordedRename(self):
+        get_kdc().get_kadmin().add_principal('efgh4567', 'password')
+        # As if a previous run renamed abcd0123 but didn't get to write back the new password
+        user = User.objects.create(identity_id=uuid.uuid4(), primary=True, username='efgh4567')
+        User.objects.filter(pk=user.pk).update(password='kerberos$2$abcd0123')
+        self.provision()
+        user.refresh_from_db()
+        self.assertEqual(user.password, 'kerberos$1$efgh4567')
+
+    def testResumePointStopsAtFirstFailure(self):
+        users = sorted((User.objects.create(identity_id=uuid.uuid4(), primary=True, username=username, password='!')
+                        for username in ('abcd0123', 'efgh4567', 'ijkl8901')), key=lambda user: user.pk)
+        command = provision_kerberos_principals.Command(stdout=io.StringIO(), stderr=io.StringIO())
+        provision = command.provision
+
+        def provision_unless_second(user):
+            if user.pk == users[1].pk:
+                raise RuntimeError("KDC unavailable")
+            return provision(user)
+
+        with unittest.mock.patch.object(command, 'provision', provision_unless_second):
+            with self.assertRaisesRegex(CommandError, str(users[1].pk)):
+                call_command(command, '--batch-size', '1', '--workers', '1')
+        output = command.stdout.getvalue()
+        self.assertIn('Committed up to {}'.format(users[0].pk), output)
+        self.assertIn('First failure at {}'.format(users[1].pk), output)
+        self.assertNotIn('Committed up to {}'.format(users[2].pk), output)
+        self.assertIn(users[2].username, get_kdc().principals)
+
+
+def fake_kinit(args):
+    # Writes an empty cache where kinit was asked to (-c FILE:...)
+    open(args[args.index('-c') + 1][len('FILE:'):], 'w').close()
+
+
+@override_settings(CLIENT_PRINCIPAL_NAME='idm-auth@EXAMPLE.COM', KERBEROS_CLIENT_KEYTAB='/nonexistent.keytab')
+class CredentialManagerTestCase(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(setattr, credentials, '_manager', None)
+        self.addCleanup(os.environ.pop, 'KRB5CCNAME', None)
+
+    def start(self):
+        manager = credentials.start_credential_manager()
+        self.addCleanup(manager.stop)
+        return manager
+
+    @unittest.mock.patch('subprocess.check_call', side_effect=fake_kinit)
+    def testStartedOncePerProcess(self, check_call):
+        self.assertIsNone(credentials.get_credential_manager())
+        manager = self.start()
+        self.assertIs(credentials.start_credential_manager(), manager)
+        self.assertIs(credentials.get_credential_manager(), manager)
+        self.assertEqual(check_call.call_count, 1)
+        self.assertEqual(os.environ['KRB5CCNAME'], manager.ccache_name)
+        self.assertEqual(credentials.get_ccache_name(), manager.ccache_name)
+        self.assertTrue(os.path.exists(manager.ccache_path))
+        self.assertLess(metrics.snapshot()['gauges']['kerberos.tgt.age'], 60)
+
+        manager.stop()
+        self.assertFalse(os.path.exists(manager.ccache_dir))
+
+    @unittest.mock.patch('subprocess.check_call', side_effect=subprocess.CalledProcessError(1, 'kinit'))
+    def testFailureRetriedInBackground(self, check_call):
+        with unittest.mock.patch.object(credentials.CredentialManager, 'retry_interval', 0.01):
+            manager = self.start()
+            self.assertIsNotNone(manager)
+            self.assertIsNone(credentials.get_ccache_name(timeout=0))
+            check_call.side_effect = fake_kinit
+            self.assertTrue(manager.ready.wait(5))
+        self.assertEqual(credentials.get_ccache_name(), manager.ccache_name)
+        self.assertGreaterEqual(metrics.snapshot()['counters']['kerberos.tgt.failed'], 1)
+
+    @unittest.mock.patch('subprocess.check_call', side_effect=fake_kinit)
+    def testKadminUsesManagedCache(self, check_call):
+        manager = self.start()
+        kadmin = unittest.mock.Mock()
+        with unittest.mock.patch.dict('sys.modules', kadmin=kadmin), \
+                override_settings(KADMIN_PRINCIPAL_NAME=None):
+            KadminKDC().get_kadmin()
+        kadmin.init_with_ccache.assert_called_once_with('idm-auth@EXAMPLE.COM', manager.ccache_name)
+        kadmin.init_with_keytab.assert_not_called()
+
+    @override_settings(KERBEROS_CLIENT_KEYTAB=None)
+    @unittest.mock.patch('subprocess.check_call')
+    def testNotConfigured(self, check_call):
+        self.assertIsNone(credentials.start_credential_manager())
+        self.assertIsNone(credentials.get_ccache_name())
+        check_call.assert_not_called()
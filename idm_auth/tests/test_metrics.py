@@ -0,0 +1,30 @@
+import uuid
+
+from django.test import TestCase
+
+from idm_auth import metrics
+from idm_auth.models import User
+from idm_auth.tests.utils import patch_identity_sync
+
+
+class MetricsViewTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        metrics.reset()
+        self.user = User.objects.create(identity_id=uuid.uuid4(), username='alice', primary=True)
+
+    def testStaffOnly(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+    def testSnapshot(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.force_login(self.user)
+        metrics.incr('test.counter', 2)
+        metrics.gauge('test.gauge', lambda: 5)
+        metrics.timing('test.timing', 0.5)
+        data = self.client.get('/metrics/').json()
+        self.assertEqual(data['counters']['test.counter'], 2)
+        self.assertEqual(data['gauges']['test.gauge'], 5)
+        self.assertEqual(data['timings']['test.timing'], {'count': 1, 'mean': 0.5, 'max': 0.5})
@@ -0,0 +1,268 @@
+import datetime
+import unittest.mock
+import uuid
+
+from Cryptodome.PublicKey import RSA
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from oidc_provider.lib.utils.token import encode_id_token
+from oidc_provider.models import Client, Code, RSAKey, Token
+
+from idm_auth import metrics
+
+from idm_auth.auth_core_integration.models import IdentityProjection
+from idm_auth.auth_core_integration.tasks import process_person_update
+from idm_auth.tasks.oidc import purge_expired_oidc_grants
+from idm_auth.models import User
+from idm_auth.oidc import access_tokens, keys
+from idm_auth.oidc.claims import IDMAuthScopeClaims
+from idm_auth.tests.utils import patch_identity_sync, update_user_from_identity_noop
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class IdentityClaimsTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        self.identity_id = uuid.uuid4()
+        self.user = User.objects.create(identity_id=self.identity_id, primary=True)
+
+    def publish_person(self, action='changed', **body):
+        body.setdefault('@type', 'Person')
+        body.setdefault('state', 'active')
+        process_person_update(body=body,
+                              delivery_info={'routing_key': 'Person.{}.{}'.format(action, self.identity_id)})
+
+    def get_claims(self):
+        token = unittest.mock.Mock(user=self.user, scope=['openid', 'name', 'email', 'identity'])
+        return IDMAuthScopeClaims(token).create_response_dic()
+
+    @unittest.mock.patch('idm_auth.auth_core_integration.utils.get_identity_data')
+    def testClaimsFromProjection(self, get_identity_data):
+        self.publish_person(primary_name={'plain': 'Alice Hacker', 'given': 'Alice', 'family': 'Hacker',
+                                          'first': 'Alice', 'last': 'Hacker'},
+                            emails=[{'value': 'alice@example.com', 'validated': False},
+                                    {'value': 'alice@example.org', 'validated': True}])
+        claims = self.get_claims()
+        get_identity_data.assert_not_called()
+        self.assertEqual(claims['name'], 'Alice Hacker')
+        self.assertEqual(claims['family_name'], 'Hacker')
+        self.assertEqual(claims['email'], 'alice@example.org')
+        self.assertEqual(claims['email_validated'], True)
+
+    @unittest.mock.patch('idm_auth.auth_core_integration.utils.get_identity_data')
+    def testProjectionFetchedWhenMissing(self, get_identity_data):
+        get_identity_data.return_value = {'@type': 'Person', 'state': 'active',
+                                          'emails': [{'value': 'alice@example.com', 'validated': False}]}
+        claims = self.get_claims()
+        get_identity_data.assert_called_once_with(self.identity_id)
+        self.assertEqual(claims['email'], 'alice@example.com')
+        self.assertNotIn('name', claims)
+        self.assertTrue(IdentityProjection.objects.filter(identity_id=self.identity_id).exists())
+
+    def testProjectionDeleted(self):
+        self.publish_person()
+        self.publish_person(action='deleted')
+        self.assertFalse(IdentityProjection.objects.filter(identity_id=self.identity_id).exists())
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class UserinfoCacheTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        cache.clear()
+        metrics.reset()
+        self.identity_id = uuid.uuid4()
+        self.user = User.objects.create(identity_id=self.identity_id, primary=True)
+        IdentityProjection.update_from_identity(self.identity_id, {
+            '@type': 'Person', 'primary_name': {'plain': 'Alice Hacker'},
+        })
+        client = Client.objects.create(name='Test', client_id='test', response_type='code')
+        self.token = Token(user=self.user, client=client, access_token='access', refresh_token='refresh',
+                           expires_at=timezone.now() + datetime.timedelta(hours=1))
+        self.token.scope = ['openid', 'name']
+        self.token.id_token = {'sub': str(self.identity_id)}
+        self.token.save()
+
+    def get_userinfo(self):
+        response = self.client.get('/openid/userinfo/', HTTP_AUTHORIZATION='Bearer access')
+        return response.status_code, response.json() if response.status_code == 200 else None
+
+    def testRepeatRequestIsCached(self):
+        status, claims = self.get_userinfo()
+        self.assertEqual(status, 200)
+        self.assertEqual(claims['name'], 'Alice Hacker')
+        # Just the token check
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_userinfo(), (200, claims))
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['oidc.userinfo.cache.miss'], 1)
+        self.assertEqual(counters['oidc.userinfo.cache.hit'], 1)
+
+    @override_settings(CACHE_SHARED=False)
+    def testNotCachedWithoutSharedCache(self):
+        self.get_userinfo()
+        self.get_userinfo()
+        self.assertEqual(metrics.snapshot()['counters']['oidc.userinfo.cache.miss'], 2)
+
+    def testExpiredTokenNotServed(self):
+        self.get_userinfo()
+        Token.objects.filter(pk=self.token.pk).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(self.get_userinfo()[0], 401)
+
+    def testRevokedTokenNotServed(self):
+        self.get_userinfo()
+        self.token.delete()
+        self.assertEqual(self.get_userinfo()[0], 401)
+
+    def testIdentityChangeInvalidates(self):
+        self.get_userinfo()
+        IdentityProjection.update_from_identity(self.identity_id, {
+            '@type': 'Person', 'primary_name': {'plain': 'Alice Cracker'},
+        })
+        self.assertEqual(self.get_userinfo()[1]['name'], 'Alice Cracker')
+
+
+class KeyCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.create_key()
+
+    def create_key(self):
+        return RSAKey.objects.create(key=RSA.generate(1024).exportKey('PEM').decode())
+
+    def testJWKSConditionalRequest(self):
+        response = self.client.get('/openid/jwks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['keys']), 1)
+        self.assertIn('max-age', response['Cache-Control'])
+        response = self.client.get('/openid/jwks/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def testKeyRotationInvalidates(self):
+        etag = self.client.get('/openid/jwks/')['ETag']
+        self.create_key()
+        response = self.client.get('/openid/jwks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['keys']), 2)
+
+    def testKeyAddedElsewhereNoticed(self):
+        self.assertEqual(len(self.client.get('/openid/jwks/').json()['keys']), 1)
+        # bulk_create doesn't send post_save, as if the key had been created by another process
+        RSAKey.objects.bulk_create([RSAKey(key=RSA.generate(1024).exportKey('PEM').decode())])
+        with override_settings(OIDC_KEYS_REFRESH=0):
+            self.assertEqual(len(self.client.get('/openid/jwks/').json()['keys']), 2)
+
+    def testKeyReplacedElsewhereNoticed(self):
+        before = self.client.get('/openid/jwks/').json()['keys'][0]['n']
+        # A queryset update doesn't send post_save either, and leaves the count and ids as they were
+        RSAKey.objects.update(key=RSA.generate(1024).exportKey('PEM').decode())
+        with override_settings(OIDC_KEYS_REFRESH=0):
+            self.assertNotEqual(self.client.get('/openid/jwks/').json()['keys'][0]['n'], before)
+
+    def testInstallRejectsChangedSignature(self):
+        with unittest.mock.patch('oidc_provider.lib.utils.token.get_client_alg_keys', lambda client, alg: []), \
+                unittest.mock.patch.object(keys, '_original_get_client_alg_keys', None):
+            with self.assertRaises(ImproperlyConfigured):
+                keys.install()
+
+    def testSigningUsesCachedKeys(self):
+        client = Client(name='Test', client_id='test', response_type='code', jwt_alg='RS256')
+        encode_id_token({'sub': 'alice'}, client)
+        with self.assertNumQueries(0):
+            encode_id_token({'sub': 'alice'}, client)
+
+    def testDiscoveryDocument(self):
+        response = self.client.get('/openid/.well-known/openid-configuration')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['jwks_uri'].startswith('http://testserver/openid/jwks'))
+        response = self.client.get('/openid/.well-known/openid-configuration', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(OIDC_JWT_ACCESS_TOKENS=True)
+class JWTAccessTokenTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        cache.clear()
+        RSAKey.objects.create(key=RSA.generate(1024).exportKey('PEM').decode())
+        self.user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        client = Client.objects.create(name='Test', client_id='test', response_type='code')
+        self.token = Token(user=self.user, client=client, access_token='access', refresh_token='refresh',
+                           expires_at=timezone.now() + datetime.timedelta(hours=1))
+        self.token.scope = ['openid', 'profile']
+        self.token.id_token = {'sub': str(self.user.identity_id)}
+        self.token.save()
+
+        @access_tokens.resource_view(['profile'])
+        def view(request, token):
+            return HttpResponse(str(token.user_id))
+        self.view = view
+
+    def exchange(self):
+        response = self.client.post('/openid/token/jwt/', HTTP_AUTHORIZATION='Bearer access')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['access_token']
+
+    def call_view(self, access_token):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' + access_token)
+        return self.view(request)
+
+    def testValidatedWithoutDatabase(self):
+        jwt = self.exchange()
+        self.call_view(jwt)
+        with self.assertNumQueries(0):
+            response = self.call_view(jwt)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), str(self.user.pk))
+
+    def testRevokedWhenTokenDeleted(self):
+        jwt = self.exchange()
+        self.token.delete()
+        self.assertEqual(self.call_view(jwt).status_code, 401)
+
+    def testTamperedTokenRejected(self):
+        header, payload, signature = self.exchange().split('.')
+        self.assertEqual(self.call_view('.'.join([header, payload, signature[::-1]])).status_code, 401)
+
+    def testIdTokenRejected(self):
+        client = Client.objects.get(client_id='test')
+        client.jwt_alg = 'RS256'
+        id_token = encode_id_token({
+            'iss': 'http://testserver/openid', 'sub': str(self.user.identity_id), 'aud': 'test',
+            'uid': str(self.user.pk), 'scope': 'openid profile', 'jti': str(self.token.pk),
+            'exp': int(self.token.expires_at.timestamp()),
+        }, client)
+        self.assertEqual(self.call_view(id_token).status_code, 401)
+
+    def testOtherIssuerRejected(self):
+        jwt = self.exchange()
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' + jwt, HTTP_HOST='testserver.local')
+        self.assertEqual(self.view(request).status_code, 401)
+
+    def testOpaqueTokenStillAccepted(self):
+        self.assertEqual(self.call_view('access').status_code, 200)
+
+    @override_settings(OIDC_JWT_ACCESS_TOKENS=False)
+    def testExchangeDisabled(self):
+        response = self.client.post('/openid/token/jwt/', HTTP_AUTHORIZATION='Bearer access')
+        self.assertEqual(response.status_code, 404)
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class PurgeExpiredGrantsTestCase(TestCase):
+    def testPurge(self):
+        user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        client = Client.objects.create(name='Test', client_id='test', response_type='code')
+        now = timezone.now()
+        for i, expires_at in enumerate([now - datetime.timedelta(minutes=1), now + datetime.timedelta(minutes=1)]):
+            Code.objects.create(user=user, client=client, expires_at=expires_at, code='code{}'.format(i))
+        for i, expires_at in enumerate([now - datetime.timedelta(days=31), now - datetime.timedelta(days=1)]):
+            Token.objects.create(user=user, client=client, expires_at=expires_at,
+                                 access_token='access{}'.format(i), refresh_token='refresh{}'.format(i))
+        purge_expired_oidc_grants(batch_size=1)
+        self.assertEqual(list(Code.objects.values_list('code', flat=True)), ['code1'])
+        # The expired token's refresh token may still be used, so it's kept until OIDC_TOKEN_PURGE_AFTER has passed
+        self.assertEqual(list(Token.objects.values_list('access_token', flat=True)), ['access1'])
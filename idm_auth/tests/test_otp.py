@@ -0,0 +1,44 @@
+import unittest.mock
+import uuid
+
+import django_otp
+from django.test import TestCase
+from django_otp.plugins.otp_totp.models import TOTPDevice
+
+from idm_auth import otp
+from idm_auth.models import User
+from idm_auth.request_cache import RequestCacheMiddleware
+from idm_auth.tests.utils import patch_identity_sync, update_user_from_identity_noop
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class RequestScopedDevicesTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        self.user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        self.device = TOTPDevice.objects.create(user=self.user, name='default')
+        self.middleware = RequestCacheMiddleware()
+        self.middleware.process_request(None)
+
+    def tearDown(self):
+        self.middleware.process_response(None, None)
+
+    def testDevicesLoadedOncePerRequest(self):
+        with self.assertNumQueries(len(list(django_otp.device_classes()))):
+            self.assertEqual(otp.default_device(self.user), self.device)
+            self.assertEqual(otp.devices_for_user(self.user), [self.device])
+            self.assertEqual(otp.devices_for_user(self.user, confirmed=False), [])
+
+    def testPrimeDevices(self):
+        other_user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        otp.prime_devices([self.user, other_user])
+        with self.assertNumQueries(0):
+            self.assertEqual(otp.devices_for_user(self.user), [self.device])
+            self.assertEqual(otp.devices_for_user(other_user), [])
+
+    def testNotCachedBetweenRequests(self):
+        otp.devices_for_user(self.user)
+        self.middleware.process_response(None, None)
+        self.middleware.process_request(None)
+        self.device.delete()
+        self.assertEqual(otp.devices_for_user(self.user), [])
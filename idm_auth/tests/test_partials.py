@@ -0,0 +1,29 @@
+import uuid
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from idm_auth.models import CachedPartial
+
+
+class CachedPartialTestCase(TestCase):
+    def create_partial(self):
+        partial = CachedPartial(token=uuid.uuid4().hex, next_step=1, backend='orcid', data={'kwargs': {}})
+        partial.save()
+        return partial
+
+    def testLoadFromCache(self):
+        partial = self.create_partial()
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedPartial.load(partial.token).backend, 'orcid')
+        CachedPartial.destroy(partial.token)
+        self.assertIsNone(CachedPartial.load(partial.token))
+
+    @override_settings(CACHE_SHARED=False, SOCIAL_AUTH_PARTIAL_DURABLE=False)
+    def testDatabaseOnlyWithoutSharedCache(self):
+        partial = self.create_partial()
+        self.assertIsNone(cache.get(CachedPartial.get_cache_key(partial.token)))
+        self.assertTrue(CachedPartial.objects.filter(token=partial.token).exists())
+        self.assertEqual(CachedPartial.load(partial.token).backend, 'orcid')
+        CachedPartial.destroy(partial.token)
+        self.assertIsNone(CachedPartial.load(partial.token))
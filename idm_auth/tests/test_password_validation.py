@@ -0,0 +1,62 @@
+import unittest.mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from idm_auth import password_validation, request_cache
+from idm_auth.forms import SetPasswordForm
+
+
+class RequestCacheTestCase(TestCase):
+    def testCacheLivesForRequest(self):
+        middleware = request_cache.RequestCacheMiddleware()
+        func = unittest.mock.Mock(return_value='value')
+
+        middleware.process_request(RequestFactory().get('/'))
+        self.assertEqual(request_cache.memoize('key', func), 'value')
+        self.assertEqual(request_cache.memoize('key', func), 'value')
+        self.assertEqual(func.call_count, 1)
+        middleware.process_response(None, HttpResponse())
+
+        # Not remembered between requests, or outside them
+        middleware.process_request(RequestFactory().get('/'))
+        request_cache.memoize('key', func)
+        self.assertEqual(func.call_count, 2)
+        middleware.process_exception(None, Exception())
+        request_cache.memoize('key', func)
+        request_cache.memoize('key', func)
+        self.assertEqual(func.call_count, 4)
+
+
+class PasswordValidationTestCase(TestCase):
+    def setUp(self):
+        middleware = request_cache.RequestCacheMiddleware()
+        middleware.process_request(None)
+        self.addCleanup(middleware.process_response, None, None)
+
+    def testZXCVBNComputedOnce(self):
+        zxcvbn = unittest.mock.Mock(return_value={'score': 4})
+        with unittest.mock.patch('zxcvbn_password.validators.zxcvbn', zxcvbn):
+            form = SetPasswordForm(data={'new_password1': 'ahCoi6shahch5aeViighie6oofiemeim',
+                                         'new_password2': 'ahCoi6shahch5aeViighie6oofiemeim'})
+            self.assertTrue(form.is_valid())
+            form.full_clean()
+        self.assertEqual(zxcvbn.call_count, 1)
+
+    def testDifferentUserInputsNotShared(self):
+        zxcvbn = unittest.mock.Mock(return_value={'score': 4})
+        with unittest.mock.patch('zxcvbn_password.validators.zxcvbn', zxcvbn):
+            password_validation.zxcvbn('password', ['alice'])
+            password_validation.zxcvbn('password', ['bob'])
+        self.assertEqual(zxcvbn.call_count, 2)
+
+    def testErrorsOnFirstField(self):
+        form = SetPasswordForm(data={'new_password1': 'password', 'new_password2': 'password'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('new_password1', form.errors)
+        self.assertNotIn('new_password2', form.errors)
+
+        form = SetPasswordForm(data={'new_password1': 'ahCoi6shahch5aeViighie6oofiemeim',
+                                     'new_password2': 'something else'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['new_password2'][0], SetPasswordForm.error_messages['password_mismatch'])
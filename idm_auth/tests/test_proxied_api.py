@@ -0,0 +1,263 @@
+import datetime
+import io
+import time
+import unittest
+import unittest.mock
+import uuid
+
+import requests
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from oidc_provider.models import Client, Token
+from requests.structures import CaseInsensitiveDict
+from social_django.models import UserSocialAuth
+from social_django.utils import load_strategy
+
+from idm_auth import http_cache, metrics, social_credentials
+from idm_auth.models import User
+from idm_auth.tests.utils import patch_identity_sync
+from idm_auth.views import ProxiedAPIView, get_upstream_session
+
+
+class FakeUpstreamResponse(object):
+    def __init__(self, body, status_code=201, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {'Content-Type': 'application/json', 'Content-Length': '12',
+                                                       'Set-Cookie': 'a=b'})
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class ProxiedAPITestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        cache.clear()
+        self.user = user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        self.usa = UserSocialAuth.objects.create(user=user, provider='orcid', uid='0000-0001',
+                                                 extra_data={'access_token': 'upstream', 'token_type': 'Bearer',
+                                                             'refresh_token': 'refresh', 'expires': 3600,
+                                                             'auth_time': int(time.time())})
+        client = Client.objects.create(name='Test', client_id='test', response_type='code')
+        token = Token(user=user, client=client, access_token='access', refresh_token='refresh',
+                      expires_at=timezone.now() + datetime.timedelta(hours=1))
+        token.id_token = {}
+        token.save()
+        self.view = ProxiedAPIView.as_view(api_url='https://api.example.org/', provider='orcid', client_id='orcid')
+
+    @unittest.mock.patch('requests.Session.request')
+    def testStreaming(self, upstream_request):
+        upstream_response = upstream_request.return_value = FakeUpstreamResponse(b'{"a": "bcde"}' * 10000)
+        request = RequestFactory().post('/proxied-api/orcid/works', data=b'{"title": "x"}',
+                                        content_type='application/json', HTTP_AUTHORIZATION='Bearer access')
+        response = self.view(request, path_info='works')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Set-Cookie', response)
+        self.assertEqual(b''.join(response.streaming_content), upstream_response.body)
+        self.assertTrue(upstream_response.closed)
+
+        method, url = upstream_request.call_args[0]
+        kwargs = upstream_request.call_args[1]
+        self.assertEqual((method, url), ('POST', 'https://api.example.org/works?'))
+        self.assertTrue(kwargs['stream'])
+        self.assertEqual(kwargs['headers']['content-type'], 'application/json')
+        self.assertEqual(kwargs['data'].read(), b'{"title": "x"}')
+        signed = kwargs['auth'](requests.Request('GET', 'https://api.example.org/works').prepare())
+        self.assertEqual(signed.headers['Authorization'], 'Bearer upstream')
+
+    @unittest.mock.patch('requests.Session.request')
+    def testChunkedUpload(self, upstream_request):
+        upstream_request.return_value = FakeUpstreamResponse(b'{}')
+        body = b'{"title": "x"}' * 10000
+        request = RequestFactory().generic('POST', '/proxied-api/orcid/works', content_type='application/json',
+                                           HTTP_AUTHORIZATION='Bearer access', HTTP_TRANSFER_ENCODING='chunked',
+                                           **{'wsgi.input': io.BytesIO(body), 'wsgi.input_terminated': True})
+        response = self.view(request, path_info='works')
+
+        self.assertEqual(response.status_code, 201)
+        kwargs = upstream_request.call_args[1]
+        self.assertNotIn('transfer-encoding', kwargs['headers'])
+        # Without a length, requests sends it chunked
+        self.assertFalse(hasattr(kwargs['data'], '__len__'))
+        self.assertEqual(b''.join(kwargs['data']), body)
+
+    @unittest.mock.patch('requests.Session.request')
+    def testChunkedUploadNeedsTerminatedInput(self, upstream_request):
+        request = RequestFactory().generic('POST', '/proxied-api/orcid/works', content_type='application/json',
+                                           HTTP_AUTHORIZATION='Bearer access', HTTP_TRANSFER_ENCODING='chunked',
+                                           **{'wsgi.input': io.BytesIO(b'{"title": "x"}')})
+        response = self.view(request, path_info='works')
+
+        self.assertEqual(response.status_code, 411)
+        upstream_request.assert_not_called()
+
+    def testSessionSharedPerHost(self):
+        session = get_upstream_session('https://api.example.org/')
+        self.assertIs(get_upstream_session('https://api.example.org/v2/'), session)
+        self.assertIsNot(get_upstream_session('https://api.example.com/'), session)
+
+    @override_settings(PROXIED_API_CACHE_SIZE=1024 * 1024)
+    @unittest.mock.patch('requests.Session.request')
+    def testResponseCache(self, upstream_request):
+        metrics.reset()
+        upstream_request.return_value = FakeUpstreamResponse(b'{"works": []}', status_code=200, headers={
+            'Content-Type': 'application/json', 'Cache-Control': 'max-age=0', 'ETag': '"v1"'})
+
+        def get():
+            request = RequestFactory().get('/proxied-api/orcid/works', HTTP_AUTHORIZATION='Bearer access')
+            response = self.view(request, path_info='works')
+            return response.status_code, response.getvalue()
+
+        self.assertEqual(get(), (200, b'{"works": []}'))
+        # Stale, so revalidated, and upstream says it's unchanged
+        upstream_request.return_value = FakeUpstreamResponse(b'', status_code=304,
+                                                             headers={'Cache-Control': 'max-age=60', 'ETag': '"v2"'})
+        self.assertEqual(get(), (200, b'{"works": []}'))
+        self.assertEqual(upstream_request.call_args[1]['headers']['If-None-Match'], '"v1"')
+        # Now fresh for a minute
+        self.assertEqual(get(), (200, b'{"works": []}'))
+        self.assertEqual(upstream_request.call_count, 2)
+        counters = metrics.snapshot()['counters']
+        self.assertEqual((counters['proxied_api.cache.miss'], counters['proxied_api.cache.revalidated'],
+                          counters['proxied_api.cache.hit']), (1, 1, 1))
+
+    @override_settings(PROXIED_API_CACHE_SIZE=1024 * 1024)
+    @unittest.mock.patch('requests.Session.request')
+    def testResponseCacheVary(self, upstream_request):
+        def get(body, vary, **headers):
+            upstream_request.return_value = FakeUpstreamResponse(body, status_code=200, headers={
+                'Cache-Control': 'max-age=60', 'Vary': vary})
+            request = RequestFactory().get('/proxied-api/orcid/works', HTTP_AUTHORIZATION='Bearer access', **headers)
+            return self.view(request, path_info='works').getvalue()
+
+        self.assertEqual(get(b'{}', 'Accept', HTTP_ACCEPT='application/json'), b'{}')
+        self.assertEqual(get(b'<works/>', 'Accept', HTTP_ACCEPT='application/xml'), b'<works/>')
+        self.assertEqual(get(b'', 'Accept', HTTP_ACCEPT='application/json'), b'{}')
+        self.assertEqual(upstream_request.call_count, 2)
+        # Varies on a header that isn't part of the key, so not cached
+        self.assertEqual(get(b'a', 'Cookie', HTTP_ACCEPT='text/plain'), b'a')
+        self.assertEqual(get(b'b', 'Cookie', HTTP_ACCEPT='text/plain'), b'b')
+
+    def testRequiresToken(self):
+        request = RequestFactory().get('/proxied-api/orcid/works')
+        self.assertEqual(self.view(request, path_info='works').status_code, 401)
+
+
+class SocialCredentialsTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        cache.clear()
+        self.user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        self.usa = UserSocialAuth.objects.create(user=self.user, provider='orcid', uid='0000-0001',
+                                                 extra_data={'access_token': 'old', 'refresh_token': 'refresh',
+                                                             'expires': 3600, 'auth_time': int(time.time())})
+
+    def testCached(self):
+        social_credentials.get_credentials('orcid', self.user.pk, 60)
+        with self.assertNumQueries(0):
+            credentials = social_credentials.get_credentials('orcid', self.user.pk, 60)
+        self.assertEqual(credentials['access_token'], 'old')
+
+    def testInvalidatedOnSave(self):
+        social_credentials.get_credentials('orcid', self.user.pk, 60)
+        self.usa.extra_data['access_token'] = 'new'
+        self.usa.save()
+        self.assertEqual(social_credentials.get_credentials('orcid', self.user.pk, 60)['access_token'], 'new')
+
+    @unittest.mock.patch('idm_auth.social_backend.ORCIDSandboxAuth.refresh_token')
+    def testRefreshedBeforeExpiry(self, refresh_token):
+        refresh_token.return_value = {'access_token': 'new', 'expires_in': 3600}
+        self.usa.extra_data['auth_time'] = int(time.time()) - 3500
+        self.usa.save()
+        credentials = social_credentials.get_credentials('orcid', self.user.pk, 60)
+        refresh_token.assert_called_once_with('refresh')
+        self.assertEqual(credentials['access_token'], 'new')
+        self.usa.refresh_from_db()
+        self.assertEqual(self.usa.extra_data['access_token'], 'new')
+        self.assertEqual(self.usa.extra_data['refresh_token'], 'refresh')
+        # The refreshed credentials are cached, and don't need refreshing again
+        social_credentials.get_credentials('orcid', self.user.pk, 60)
+        refresh_token.assert_called_once_with('refresh')
+
+    @unittest.mock.patch('idm_auth.social_backend.ORCIDSandboxAuth.refresh_token')
+    def testFailedRefreshNotRetriedImmediately(self, refresh_token):
+        refresh_token.side_effect = Exception('Upstream unavailable')
+        self.usa.extra_data['auth_time'] = int(time.time()) - 3500
+        self.usa.save()
+        self.assertEqual(social_credentials.get_credentials('orcid', self.user.pk, 60)['access_token'], 'old')
+        with self.assertNumQueries(0):
+            self.assertEqual(social_credentials.get_credentials('orcid', self.user.pk, 60)['access_token'], 'old')
+        refresh_token.assert_called_once_with('refresh')
+
+    @override_settings(CACHE_SHARED=False)
+    def testNotCachedWithoutSharedCache(self):
+        social_credentials.get_credentials('orcid', self.user.pk, 60)
+        # As if saved by another process, whose invalidation wouldn't reach this one's cache
+        UserSocialAuth.objects.filter(pk=self.usa.pk).update(extra_data=dict(self.usa.extra_data, access_token='new'))
+        with self.assertNumQueries(1):
+            self.assertEqual(social_credentials.get_credentials('orcid', self.user.pk, 60)['access_token'], 'new')
+
+    @override_settings(CACHE_SHARED=False)
+    @unittest.mock.patch('idm_auth.social_backend.ORCIDSandboxAuth.refresh_token')
+    def testRefreshedUnderRowLockWithoutSharedCache(self, refresh_token):
+        refresh_token.return_value = {'access_token': 'new', 'expires_in': 3600}
+        self.usa.extra_data['auth_time'] = int(time.time()) - 3500
+        self.usa.save()
+        with unittest.mock.patch('idm_auth.social_credentials.cache_lock') as cache_lock:
+            credentials = social_credentials.get_credentials('orcid', self.user.pk, 60)
+        cache_lock.assert_not_called()
+        self.assertEqual(credentials['access_token'], 'new')
+        self.usa.refresh_from_db()
+        self.assertEqual(self.usa.extra_data['access_token'], 'new')
+
+    def testNoRefreshToken(self):
+        del self.usa.extra_data['refresh_token']
+        self.usa.extra_data['auth_time'] = int(time.time()) - 3500
+        self.usa.save()
+        social_credentials.get_credentials('orcid', self.user.pk, 60)
+        with self.assertNumQueries(0):
+            social_credentials.get_credentials('orcid', self.user.pk, 60)
+
+    def testRefreshTokenKept(self):
+        backend = self.usa.get_backend_instance(load_strategy())
+        extra_data = backend.extra_data(self.user, '0000-0001', {'access_token': 'new', 'refresh_token': 'refresh',
+                                                                 'expires_in': 3600, 'orcid': '0000-0001'}, {})
+        self.assertEqual(extra_data['refresh_token'], 'refresh')
+        self.assertEqual(extra_data['expires'], 3600)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def testFreshnessLifetime(self):
+        self.assertEqual(http_cache.freshness_lifetime({'Cache-Control': 'private, max-age=30'}), 30)
+        self.assertIsNone(http_cache.freshness_lifetime({'Cache-Control': 'no-store, max-age=30'}))
+        self.assertIsNone(http_cache.freshness_lifetime({}))
+        self.assertEqual(http_cache.freshness_lifetime({'Cache-Control': 'no-cache', 'ETag': '"a"'}), 0)
+
+    def testEviction(self):
+        response_cache = http_cache.ResponseCache(max_size=10, max_entry_size=6)
+        response_cache.set('a', 200, {}, b'aaaa', 60)
+        response_cache.set('b', 200, {}, b'bbbb', 60)
+        response_cache.get('a')
+        response_cache.set('c', 200, {}, b'cccc', 60)
+        response_cache.set('d', 200, {}, b'ddddddd', 60)
+        self.assertIsNone(response_cache.get('b'))
+        self.assertIsNone(response_cache.get('d'))
+        self.assertEqual(response_cache.get('a').body, b'aaaa')
+        self.assertEqual(response_cache.size, 8)
+
+    def testFreshenUpdatesHeaders(self):
+        response_cache = http_cache.ResponseCache(max_size=10, max_entry_size=6)
+        response_cache.set('a', 200, {'ETag': '"v1"', 'Content-Type': 'text/plain'}, b'aaaa', 0)
+        entry = response_cache.freshen('a', 60, [('ETag', '"v2"')])
+        self.assertEqual(entry.headers['etag'], '"v2"')
+        self.assertEqual(entry.headers['Content-Type'], 'text/plain')
+        self.assertGreater(entry.expires_at, time.time())
@@ -0,0 +1,90 @@
+import importlib
+import unittest.mock
+import uuid
+
+from django.apps import apps
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from idm_auth import session_backend
+from idm_auth.models import User, UserSession
+from idm_auth.tests.utils import patch_identity_sync, update_user_from_identity_noop
+
+
+@unittest.mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity', update_user_from_identity_noop)
+class UserSessionTestCase(TestCase):
+    def setUp(self):
+        patch_identity_sync(self)
+        self.user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        self.user.set_password('correct horse battery staple')
+        self.user.save()
+
+    def testSessionIndexedByUser(self):
+        self.client.force_login(self.user)
+        session = UserSession.objects.get()
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(session_backend.count_sessions(authenticated=True), 1)
+
+    def testRevokeUserSessions(self):
+        Client().force_login(self.user)
+        Client().force_login(self.user)
+        other_user = User.objects.create(identity_id=uuid.uuid4(), primary=True)
+        Client().force_login(other_user)
+
+        self.assertEqual(session_backend.revoke_user_sessions(self.user), 2)
+        self.assertEqual(list(UserSession.objects.values_list('user', flat=True)), [other_user.pk])
+
+    def testDeletingUserDeletesSessions(self):
+        self.client.force_login(self.user)
+        self.user.delete()
+        self.assertFalse(UserSession.objects.exists())
+
+    def testPasswordChangeRevokesSessions(self):
+        Client().force_login(self.user)
+        self.user.set_password('another password')
+        self.user.save()
+        self.assertFalse(UserSession.objects.exists())
+
+    def testPasswordChangeViewKeepsCurrentSession(self):
+        Client().force_login(self.user)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('password-change'), {
+            'old_password': 'correct horse battery staple',
+            'new_password1': 'a different passphrase',
+            'new_password2': 'a different passphrase',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(UserSession.objects.values_list('session_key', flat=True)),
+                         [self.client.session.session_key])
+
+    def testSaveWithoutPasswordChangeKeepsSessions(self):
+        self.client.force_login(self.user)
+        self.user.first_name = 'Alice'
+        self.user.save()
+        self.assertTrue(UserSession.objects.exists())
+
+    @override_settings(SESSION_COUNT_INTERVAL=300)
+    def testSessionCountsComputedPeriodically(self):
+        with unittest.mock.patch.object(session_backend, '_session_counts', (None, {})):
+            self.client.force_login(self.user)
+            Client().session.save()
+            self.assertEqual(session_backend.get_session_counts(), {'active': 2, 'authenticated': 1})
+            Client().force_login(self.user)
+            with self.assertNumQueries(0):
+                self.assertEqual(session_backend.get_session_counts(), {'active': 2, 'authenticated': 1})
+
+    def testSessionsCopiedFromOldEngine(self):
+        old_session = DBStore()
+        old_session.update({'_auth_user_id': str(self.user.pk)})
+        old_session.create()
+        anonymous_session = DBStore()
+        anonymous_session.create()
+
+        migration = importlib.import_module('idm_auth.migrations.0013_copy_sessions')
+        migration.copy_sessions(apps, None)
+
+        self.assertEqual(dict(UserSession.objects.values_list('session_key', 'user')),
+                         {old_session.session_key: self.user.pk, anonymous_session.session_key: None})
+        self.assertEqual(session_backend.SessionStore(old_session.session_key).load()['_auth_user_id'],
+                         str(self.user.pk))
@@ -79,4 +79,15 @@ def get_fake_identity_data(identity_id):
 
 
 def update_user_from_identity_noop(user, identity=None):
-    pass
\ No newline at end of file
+    pass
+
+def patch_identity_sync(test_case):
+    """
+    Stops saving users from fetching their identities from idm-core, until the end of the test
+
+    For calling from setUp(); patching the class only covers its test methods.
+    """
+    patcher = mock.patch('idm_auth.auth_core_integration.utils.update_user_from_identity',
+                         update_user_from_identity_noop)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
@@ -67,11 +67,17 @@ urlpatterns = [
 
     url(r'^saml-metadata/$', idm_auth.saml.views.SAMLMetadataView.as_view(), name='saml-metadata'),
     # OpenID Connect
+    url(r'^openid/userinfo/?$', idm_auth.oidc.views.userinfo, name='oidc-userinfo'),
+    url(r'^openid/\.well-known/openid-configuration/?$', idm_auth.oidc.views.ProviderInfoView.as_view(),
+        name='oidc-provider-info'),
+    url(r'^openid/jwks/?$', idm_auth.oidc.views.JwksView.as_view(), name='oidc-jwks'),
+    url(r'^openid/token/jwt/?$', idm_auth.oidc.views.jwt_access_token, name='oidc-jwt-access-token'),
     url(r'^openid/', include('oidc_provider.urls', namespace='oidc_provider')),
     url(r'', include('social_django.urls', namespace='social')),
     url(r'', include(tf_urls, 'two_factor')),
     url(r'^ssh-key/', include('idm_auth.ssh_key.urls', 'ssh-key')),
     url(r'^admin/', admin.site.urls),
+    url(r'^metrics/$', views.MetricsView.as_view(), name='metrics'),
 
     url('^user/$', views.UserListView.as_view(), name='user-list'),
     url('^user/(?P<pk>' + uuid_re + ')/$', views.UserDetailView.as_view(), name='user-detail'),
@@ -1,5 +1,6 @@
 from .devolved_admin import *
 from .login import *
+from .metrics import *
 from .password import *
 from .proxied_api import *
 from .self_service import *
\ No newline at end of file
@@ -1,11 +1,53 @@
+import uuid
+
+from django.db.models import Exists, OuterRef
+from django.http import Http404
 from django.views.generic import DetailView, ListView
+from social_django.models import UserSocialAuth
 
-from .. import models
+from .. import models, otp
 
 __all__ = ['UserListView', 'UserDetailView']
 
 class UserListView(ListView):
+    """
+    Lists users a page at a time, using keyset pagination on the primary key
+
+    Pages are addressed by the id they start after (or end before), so each is an index range scan however far into
+    the table it is, and no COUNT(*) is needed.
+    """
     model = models.User
+    page_size = 100
+
+    def get_queryset(self):
+        return super().get_queryset().annotate(
+            has_social_auth=Exists(UserSocialAuth.objects.filter(user_id=OuterRef('pk'))))
+
+    def get_keyset_param(self, name):
+        try:
+            return uuid.UUID(self.request.GET[name]) if name in self.request.GET else None
+        except ValueError:
+            raise Http404
+
+    def get_context_data(self, **kwargs):
+        queryset = self.object_list
+        after, before = self.get_keyset_param('after'), self.get_keyset_param('before')
+        if before:
+            page = list(queryset.filter(pk__lt=before).order_by('-pk')[:self.page_size + 1])[::-1]
+            has_previous, has_next = len(page) > self.page_size, True
+            page = page[-self.page_size:]
+        else:
+            if after:
+                queryset = queryset.filter(pk__gt=after)
+            page = list(queryset.order_by('pk')[:self.page_size + 1])
+            has_previous, has_next = after is not None, len(page) > self.page_size
+            page = page[:self.page_size]
+        otp.prime_devices(page)
+        return super().get_context_data(
+            object_list=page,
+            next_after=page[-1].pk if page and has_next else None,
+            previous_before=page[0].pk if page and has_previous else None,
+            **kwargs)
 
 
 class UserDetailView(DetailView):
@@ -5,7 +5,6 @@ from django.shortcuts import resolve_url, redirect
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.http import is_safe_url
-from social_django.models import Partial
 
 from idm_auth.saml.models import IDP
 from two_factor.forms import AuthenticationTokenForm
@@ -14,6 +13,7 @@ from two_factor.forms import BackupTokenForm
 from two_factor.views.core import LoginView as TwoFactorLoginView
 
 from .. import backend_meta, forms
+from ..models import CachedPartial
 
 __all__ = ['SocialTwoFactorLoginView']
 
@@ -27,10 +27,8 @@ class SocialTwoFactorLoginView(TwoFactorLoginView):
 
     @cached_property
     def current_partial(self):
-        try:
-            return Partial.objects.get(token=self.request.session['partial_pipeline_token'])
-        except (KeyError, Partial.DoesNotExist):
-            return None
+        if 'partial_pipeline_token' in self.request.session:
+            return CachedPartial.load(self.request.session['partial_pipeline_token'])
 
     def has_auth_step(self):
         return self.current_partial is None or 'user_id' not in self.current_partial.data['kwargs']
@@ -61,7 +59,7 @@ class SocialTwoFactorLoginView(TwoFactorLoginView):
         })
         if self.steps.current == 'auth':
             context.update({
-                'social_backends': list(sorted([bm for bm in backend_meta.BackendMeta.registry.values() if bm.backend_id != 'saml'], key=lambda sb: sb.name)),
+                'social_backends': backend_meta.BackendMeta.social_backends(),
                 'idps': IDP.objects.all().order_by('label'),
                 'awaiting_activation': 'awaiting-activation' in self.request.GET,
             })
@@ -0,0 +1,17 @@
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.http import JsonResponse
+from django.views import View
+
+from .. import metrics
+
+__all__ = ['MetricsView']
+
+
+class MetricsView(UserPassesTestMixin, View):
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse(metrics.snapshot())
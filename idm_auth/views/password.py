@@ -1,6 +1,5 @@
 from django.contrib.auth import views as auth_views
 
-from idm_auth.kerberos.apps import get_kadmin
 from .. import forms
 
 __all__ = ['PasswordChangeView', 'PasswordChangeDoneView']
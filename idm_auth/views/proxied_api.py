@@ -1,13 +1,109 @@
-from urllib.parse import urljoin
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
 
 import requests
 import requests_oauthlib
+from requests.adapters import HTTPAdapter
 from django.conf import settings
-from django.http import HttpResponse
+from django.core.signals import setting_changed
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
-from oidc_provider.lib.utils.oauth2 import protected_resource_view
-from social_django.models import UserSocialAuth
+from django.views.decorators.csrf import csrf_exempt
+
+from idm_auth import http_cache, metrics, social_credentials
+from idm_auth.oidc import access_tokens
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_upstream_session(api_url):
+    """
+    Returns a requests session shared by every proxied call to the same upstream host
+
+    Its connection pool keeps connections alive between calls, so that they don't each pay for a TLS handshake.
+    Credentials differ per user, and so are passed with each request rather than held by the session.
+    """
+    host = urlsplit(api_url).netloc
+    try:
+        return _sessions[host]
+    except KeyError:
+        pass
+    with _sessions_lock:
+        if host not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=getattr(settings, 'PROXIED_API_POOL_CONNECTIONS', 4),
+                pool_maxsize=getattr(settings, 'PROXIED_API_POOL_MAXSIZE', 10),
+                pool_block=getattr(settings, 'PROXIED_API_POOL_BLOCK', False))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            metrics.gauge('proxied_api.{}.connections_opened'.format(host),
+                          lambda: _pool_stat(adapter, 'num_connections'))
+            metrics.gauge('proxied_api.{}.requests'.format(host), lambda: _pool_stat(adapter, 'num_requests'))
+            _sessions[host] = session
+        return _sessions[host]
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Returns the per-process cache of proxied GET responses, or None if PROXIED_API_CACHE_SIZE is zero"""
+    global _response_cache
+    if _response_cache is None and getattr(settings, 'PROXIED_API_CACHE_SIZE', 0):
+        _response_cache = http_cache.ResponseCache(settings.PROXIED_API_CACHE_SIZE,
+                                                   getattr(settings, 'PROXIED_API_CACHE_MAX_ENTRY_SIZE', 1024 * 1024))
+        metrics.gauge('proxied_api.cache.size', lambda: _response_cache.size if _response_cache else 0)
+    return _response_cache
+
+
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting.startswith('PROXIED_API_CACHE_'):
+        _response_cache = None
+
+setting_changed.connect(reset_response_cache)
+
+
+def _pool_stat(adapter, name):
+    pools = adapter.poolmanager.pools
+    return sum(getattr(pools[key], name) for key in pools.keys())
+
+
+class _RequestBody(object):
+    """
+    Wraps an incoming request so that requests streams it upstream
+
+    Having a length stops requests falling back to a chunked transfer encoding when the client gave a Content-Length.
+    """
+    def __init__(self, request, length):
+        self.request, self.length = request, length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=None):
+        # Django's LimitedStream reads nothing, rather than everything, when given a negative size
+        if size is None or size < 0:
+            return self.request.read()
+        return self.request.read(size)
+
+
+def _iter_chunked_body(stream, chunk_size):
+    """
+    Yields a request body of unknown length from the server's input stream, so that requests sends it upstream with a
+    chunked transfer encoding
+    """
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
 
 
 class ProxiedAPIView(View):
@@ -19,6 +115,7 @@ class ProxiedAPIView(View):
                                                       'Authorization',
                                                       'X-Forwarded-For',
                                                       'TE',
+                                                      'Transfer-Encoding',
                                                       'Accept-Encoding',
                                                       'Cookie',
                                                       'Connection'})
@@ -37,8 +134,19 @@ class ProxiedAPIView(View):
                                                        'Transfer-Encoding',
                                                        'Upgrade'})
 
-    @method_decorator(protected_resource_view())
+    # Conditional and partial requests from the client are passed straight through, bypassing the response cache
+    uncacheable_request_headers = {'if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since', 'range'}
+    # Request headers that are part of the response cache key, as upstream may choose a representation by them (e.g.
+    # ORCID serves JSON or XML by Accept). Responses that Vary on any other request header aren't cached.
+    cache_key_request_headers = ('accept', 'accept-language')
+
+    # Upstream responses are relayed in chunks of this many bytes, bounding the memory used by each request
+    chunk_size = 64 * 1024
+
+    @method_decorator(csrf_exempt)
+    @method_decorator(access_tokens.resource_view())
     def dispatch(self, request, path_info, token):
+        start = time.time()
         api_url = urljoin(self.api_url, path_info) + '?' + request.META.get('QUERY_STRING', '')
         headers = {}
         for k, v in request.META.items():
@@ -47,16 +155,87 @@ class ProxiedAPIView(View):
             k = k[5:].lower().replace('_', '-')
             if k not in self.discard_request_headers:
                 headers[k] = v
+        if request.META.get('CONTENT_TYPE'):
+            headers['content-type'] = request.META['CONTENT_TYPE']
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if content_length:
+            body = _RequestBody(request, content_length)
+        elif 'chunked' in request.META.get('HTTP_TRANSFER_ENCODING', '').lower():
+            # Django reads no further than CONTENT_LENGTH, so a chunked body has to be read from the server's input
+            # stream, which is only safe where the server says that stream ends with the body (as gunicorn does)
+            if not request.META.get('wsgi.input_terminated'):
+                return HttpResponse('A Content-Length is required.', status=411, content_type='text/plain')
+            body = _iter_chunked_body(request.META['wsgi.input'], self.chunk_size)
+        else:
+            body = None
+
+        response_cache, cache_key, cached = get_response_cache(), None, None
+        if response_cache and request.method == 'GET' and not self.uncacheable_request_headers & set(headers):
+            cache_key = (self.provider, str(token.user_id), api_url) + \
+                tuple(headers.get(k) for k in self.cache_key_request_headers)
+            cached = response_cache.get(cache_key)
+            if cached and cached.expires_at > time.time():
+                metrics.incr('proxied_api.cache.hit')
+                return self.cached_response(cached, start)
+            elif cached:
+                headers.update(http_cache.conditional_headers(cached))
+
+        credentials = social_credentials.get_credentials(self.provider, token.user_id,
+                                                         max(int((token.expires_at - timezone.now()).total_seconds()), 1))
+        auth = requests_oauthlib.OAuth2(client_id=self.client_id, token=credentials)
+
+        upstream_response = get_upstream_session(self.api_url).request(
+            request.method, api_url, headers=headers, auth=auth, stream=True, data=body)
+        metrics.timing('proxied_api.time_to_first_byte', time.time() - start)
+
+        if cached and upstream_response.status_code == 304:
+            upstream_response.close()
+            metrics.incr('proxied_api.cache.revalidated')
+            lifetime = http_cache.freshness_lifetime(upstream_response.headers) or 0
+            updated_headers = [(k, v) for k, v in upstream_response.headers.items()
+                               if k.lower() not in self.discard_response_headers]
+            return self.cached_response(response_cache.freshen(cache_key, lifetime, updated_headers) or cached, start)
+
+        relayed_headers = [(k, v) for k, v in upstream_response.headers.items()
+                           if k.lower() not in self.discard_response_headers]
+        cache_as = None
+        if cache_key:
+            metrics.incr('proxied_api.cache.miss')
+            lifetime = http_cache.freshness_lifetime(upstream_response.headers)
+            vary = http_cache.vary_headers(upstream_response.headers)
+            if upstream_response.status_code == 200 and lifetime is not None and \
+                    vary is not None and vary <= set(self.cache_key_request_headers):
+                cache_as = (response_cache, cache_key, relayed_headers, lifetime)
 
-        usa = UserSocialAuth.objects.get(user=token.user, provider=self.provider)
-        token = usa.extra_data
+        response = StreamingHttpResponse(self.relay(upstream_response, start, cache_as),
+                                         status=upstream_response.status_code)
+        for k, v in relayed_headers:
+            response[k] = v
+        return response
 
-        session = requests_oauthlib.OAuth2Session(client_id=self.client_id,
-                                                  token=token)
+    def cached_response(self, cached, start):
+        response = HttpResponse(cached.body, status=cached.status)
+        for k, v in cached.headers.items():
+            response[k] = v
+        metrics.timing('proxied_api.duration', time.time() - start)
+        return response
 
-        upstream_response = session.request(request.method, api_url, headers=headers)
-        response = HttpResponse(upstream_response.content, status=upstream_response.status_code)
-        for k, v in upstream_response.headers.items():
-            if k.lower() not in self.discard_response_headers:
-                response[k] = v
-        return response
\ No newline at end of file
+    def relay(self, upstream_response, start, cache_as=None):
+        """Yields the upstream response body, storing it in the response cache if it's cacheable and small enough"""
+        chunks, size = [], 0
+        try:
+            for chunk in upstream_response.iter_content(self.chunk_size):
+                metrics.incr('proxied_api.bytes', len(chunk))
+                if cache_as:
+                    size += len(chunk)
+                    if size > cache_as[0].max_entry_size:
+                        cache_as, chunks = None, []
+                    else:
+                        chunks.append(chunk)
+                yield chunk
+            if cache_as:
+                response_cache, cache_key, headers, lifetime = cache_as
+                response_cache.set(cache_key, 200, headers, b''.join(chunks), lifetime)
+        finally:
+            upstream_response.close()
+            metrics.timing('proxied_api.duration', time.time() - start)
@@ -2,10 +2,8 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.views.generic import TemplateView
 
-from two_factor.utils import default_device
-
-from idm_auth import backend_meta
 from idm_auth.backend_meta import BackendMeta
+from idm_auth.otp import default_device
 
 __all__ = ['ProfileView', 'SocialLoginsView', 'IndexView', 'RecoverView']
 
@@ -22,10 +20,9 @@ class ProfileView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         return {
-            'associated': [BackendMeta.wrap(user_social_auth)
-                           for user_social_auth in self.request.user.social_auth.all()],
+            'associated': BackendMeta.wrap_all(self.request.user.social_auth.all()),
             'two_factor_default_device': default_device(self.request.user),
-            'social_backends': list(sorted([bm for bm in backend_meta.BackendMeta.registry.values() if bm.backend_id != 'saml'], key=lambda sb: sb.name)),
+            'social_backends': BackendMeta.social_backends(),
         }
 
 
@@ -34,9 +31,8 @@ class SocialLoginsView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         return {
-            'associated': [BackendMeta.wrap(user_social_auth)
-                           for user_social_auth in self.request.user.social_auth.all()],
-            'social_backends': list(sorted([bm for bm in backend_meta.BackendMeta.registry.values() if bm.backend_id != 'saml'], key=lambda sb: sb.name)),
+            'associated': BackendMeta.wrap_all(self.request.user.social_auth.all()),
+            'social_backends': BackendMeta.social_backends(),
         }
 
 